@@ -1,3 +1,16 @@
 from .pyomoio import *
 from .core import *
+from .community import *
+from .stochastic import *
+from .sensitivity import *
+from .dispatch import *
+from .kpi import *
+from .store import *
+from .simulate import *
+from .batch import *
+from .race import *
+from .aio import *
+from .pareto import *
+from .surrogate import *
+from .tune import *
 from .cli import *
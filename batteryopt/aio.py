@@ -0,0 +1,288 @@
+"""Solve models from asyncio programs.
+
+The solver runs in a forked process, in its own process group, whose output is
+read by the event loop. Cancelling the coroutine, e.g. when the timeout of
+``asyncio.wait_for`` expires, kills the process and the solver executable it
+started.
+
+Example:
+    >>> async def main():
+    ...     scheduler = SolveScheduler(max_concurrent=4)
+    ...     return await scheduler.solve_all(
+    ...         [store.load(i) for i in store.ids], timeout=600
+    ...     )
+"""
+
+import asyncio
+import multiprocessing
+import os
+import pickle
+import re
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from pyomo.environ import Var
+
+from batteryopt.race import _cancel, _config, _solver, default_solver
+
+Progress = namedtuple("Progress", ["seconds", "incumbent", "bound", "gap"])
+Progress.__doc__ = """Progress of a solve: seconds since its start, objective of
+the incumbent solution, best bound and relative gap (None when unknown)."""
+
+NUMBER = r"-?(?:\d+\.?\d*(?:e[+-]?\d+)?|inf)"
+# solver log lines with the incumbent and the best bound
+LOG_PATTERNS = [
+    # gurobi: "H    0     0                    5181.8859 4000.00000  22.8%     -    0s"
+    re.compile(
+        rf"(?P<incumbent>{NUMBER}|-)\s+(?P<bound>{NUMBER})\s+"
+        rf"(?P<gap>[\d.]+%|-)\s+\S+\s+\d+s\s*$"
+    ),
+    # highs: " R  0  0  0   0.00%   34206.36   34223.80   0.05%   0  0  0   175  0.1s"
+    re.compile(
+        rf"\d+\.\d+%\s+(?P<bound>{NUMBER})\s+(?P<incumbent>{NUMBER})\s+"
+        rf"(?P<gap>[\d.]+%|\S+)\s+\d+\s+\d+\s+\d+\s+\d+\s+[\d.]+s\s*$"
+    ),
+    # cbc: "Cbc0010I After 100 nodes, 20 on tree, 5181.88 best solution, best
+    # possible 4000.12 (0.50 seconds)"
+    re.compile(
+        rf"Cbc0010I.* (?P<incumbent>{NUMBER}) best solution, "
+        rf"best possible (?P<bound>{NUMBER})"
+    ),
+    # glpk: "+   150: mip =   5.181885906e+03 >=   4.000000000e+03  22.8% (18; 0)"
+    re.compile(
+        rf"mip =\s+(?P<incumbent>{NUMBER})\s+[<>]=\s+(?P<bound>{NUMBER})"
+        rf"(?:\s+(?P<gap>[\d.]+%))?"
+    ),
+]
+
+
+def parse_progress(line):
+    """Return the (incumbent, bound, gap) of a solver log line, or None.
+
+    Lines of the branch and bound logs of Gurobi, HiGHS, CBC and GLPK are
+    recognized. Values that are not known yet are None.
+    """
+    for pattern in LOG_PATTERNS:
+        match = pattern.search(line)
+        if match:
+            break
+    else:
+        return None
+    incumbent = _number(match["incumbent"])
+    bound = _number(match["bound"])
+    if incumbent is not None and abs(incumbent) >= 1e50:
+        incumbent = None  # cbc before the first solution
+    gap = match.groupdict().get("gap")
+    if gap and gap.endswith("%"):
+        gap = float(gap[:-1]) / 100
+    elif incumbent is not None and bound is not None and abs(bound) != float("inf"):
+        gap = abs(incumbent - bound) / max(abs(incumbent), 1e-10)
+    else:
+        gap = None
+    return incumbent, bound, gap
+
+
+class SolveJob:
+    """A solve that can be awaited, cancelled and followed.
+
+    Args:
+        model_or_inputs (ConcreteModel or dict): the model, or keyword arguments
+            of create_model (e.g. from :meth:`TimeSeriesStore.load`) to build it
+            in an executor.
+        solver (str or dict): solver, see :func:`run_model`. If None, the winner
+            of the past solver races.
+        mipgap (float): relative MIP gap. If None, the solver default is used.
+        grace (float): seconds given to the solver to exit when cancelled
+            before it is killed.
+
+    Example:
+        >>> job = SolveJob(model, solver="gurobi")
+        >>> task = asyncio.create_task(job.run())
+        >>> async for progress in job.progress():
+        ...     print(progress.incumbent, progress.gap)
+        >>> model = await task
+    """
+
+    def __init__(self, model_or_inputs, solver=None, mipgap=None, grace=1):
+        self.model = model_or_inputs
+        self.config = _config(default_solver() if solver is None else solver)
+        self.mipgap = mipgap
+        self.grace = grace
+        self.log = []  # lines of the solver log
+        self._progress = None  # created in the running loop, see _queue
+
+    def _queue(self):
+        """Return the queue of the progress, created in the running loop since
+        on Python < 3.10 it binds to the event loop current at its creation."""
+        if self._progress is None:
+            self._progress = asyncio.Queue()
+        return self._progress
+
+    async def progress(self):
+        """Yield the :class:`Progress` of the solve until it ends."""
+        while True:
+            progress = await self._queue().get()
+            if progress is None:
+                return
+            yield progress
+
+    async def run(self):
+        """Solve the model and return it with the values of the solution."""
+        loop = asyncio.get_running_loop()
+        try:
+            if isinstance(self.model, dict):
+                from batteryopt import create_model
+
+                inputs = self.model
+                self.model = await loop.run_in_executor(
+                    None, lambda: create_model(**inputs)
+                )
+            return await self._solve(loop)
+        finally:
+            self._queue().put_nowait(None)
+
+    async def _solve(self, loop):
+        fd, results = tempfile.mkstemp(suffix=".pkl")
+        os.close(fd)
+        read_fd, write_fd = os.pipe()
+        process = multiprocessing.get_context("fork").Process(
+            target=_solve_child,
+            args=(self.model, self.config, self.mipgap, write_fd, results),
+            daemon=True,
+        )
+        start = time.perf_counter()
+        try:
+            process.start()
+        finally:
+            os.close(write_fd)
+        try:
+            reader = asyncio.StreamReader()
+            transport, _ = await loop.connect_read_pipe(
+                lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(read_fd, "rb")
+            )
+            try:
+                async for line in reader:
+                    line = line.decode(errors="replace").rstrip()
+                    self.log.append(line)
+                    parsed = parse_progress(line)
+                    if parsed:
+                        seconds = time.perf_counter() - start
+                        self._queue().put_nowait(Progress(seconds, *parsed))
+            finally:
+                transport.close()
+            await loop.run_in_executor(None, process.join)
+            with open(results, "rb") as f:
+                status, values = pickle.load(f)
+        except BaseException:
+            # cancelled, e.g. by asyncio.wait_for: stop the solver
+            _cancel([process], self.grace)
+            raise
+        finally:
+            os.remove(results)
+
+        if status is None:
+            raise RuntimeError(
+                f"{self.config['solver']} failed:\n" + "\n".join(self.log[-20:])
+            )
+        if status != "optimal":
+            raise RuntimeError(f"{self.config['solver']} finished with {status}")
+        for var, value in zip(self.model.component_data_objects(Var), values):
+            var.set_value(value, skip_validation=True)
+        self.model.optim = _solver(
+            self.config, self.mipgap, f"{self.config['solver']}_run.txt"
+        )
+        return self.model
+
+
+async def solve_async(model_or_inputs, solver=None, mipgap=None, timeout=None):
+    """Solve a model without blocking the event loop.
+
+    Args:
+        model_or_inputs (ConcreteModel or dict): the model, or keyword arguments
+            of create_model.
+        solver (str or dict): solver, see :func:`run_model`.
+        mipgap (float): relative MIP gap.
+        timeout (float): seconds after which the solver is killed and
+            asyncio.TimeoutError is raised. Wrapping the call in
+            ``asyncio.wait_for`` has the same effect.
+
+    Returns:
+        ConcreteModel: the solved model.
+    """
+    job = SolveJob(model_or_inputs, solver, mipgap)
+    return await asyncio.wait_for(job.run(), timeout)
+
+
+class SolveScheduler:
+    """Run solves with at most `max_concurrent` solvers at once.
+
+    Solves wait for a free slot before building their model, so that the
+    number of models in memory is bounded too.
+
+    Args:
+        max_concurrent (int): maximum number of concurrent solves, the number
+            of CPUs by default.
+    """
+
+    def __init__(self, max_concurrent=None):
+        self.max_concurrent = max_concurrent or os.cpu_count() or 1
+        self._loop = self._semaphore = None
+
+    async def solve(self, model_or_inputs, **kwargs):
+        """Wait for a free slot and :func:`solve_async` the model."""
+        async with self._slots():
+            return await solve_async(model_or_inputs, **kwargs)
+
+    async def solve_all(self, models_or_inputs, return_exceptions=False, **kwargs):
+        """Solve all the models and return them in the same order.
+
+        Args:
+            models_or_inputs (list): models or keyword arguments of
+                create_model.
+            return_exceptions (bool): if True, failed solves return their
+                exception instead of cancelling the others.
+            **kwargs: arguments of :func:`solve_async`, e.g. `timeout`.
+        """
+        return await asyncio.gather(
+            *(self.solve(m, **kwargs) for m in models_or_inputs),
+            return_exceptions=return_exceptions,
+        )
+
+    def _slots(self):
+        """Return the semaphore of the running loop. It is created there since
+        on Python < 3.10 it binds to the event loop current at its creation,
+        and again for each loop the scheduler is used in."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+
+def _solve_child(model, config, mipgap, fd, results):
+    """Solve `model` with its output written to `fd` and the values to
+    `results`."""
+    os.setpgid(0, 0)  # own process group, to cancel the solver with it
+    os.dup2(fd, 1)
+    os.dup2(fd, 2)
+    os.close(fd)
+    sys.stdout = sys.stderr = open(1, "w", buffering=1, closefd=False)
+    status, values = None, None
+    try:
+        logfile = f"{config['solver']}_run.txt"
+        result = _solver(config, mipgap, logfile).solve(model, tee=True)
+        status = str(result.solver.termination_condition)
+        values = [var.value for var in model.component_data_objects(Var)]
+    finally:
+        with open(results, "wb") as f:
+            pickle.dump((status, values), f)
+        sys.stdout.flush()
+
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,334 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+import traceback
+
+from path import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    building TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    finished_at REAL,
+    objective REAL,
+    result TEXT,
+    error TEXT,
+    UNIQUE (building, params)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+
+class JobLedger:
+    """SQLite ledger of the jobs (building x parameter set) of a batch run.
+
+    The ledger is a single file that workers on several machines can share over
+    a network file system. Jobs are claimed in a write transaction, so that a
+    job is never given to two workers. A claimed job that is not finished within
+    `lease` seconds is considered abandoned (e.g. its node died) and can be
+    claimed again. Finished jobs are never solved again, so a crashed run
+    resumes by restarting its workers.
+
+    SQLite relies on the file locks of the file system: use a file system with
+    working POSIX locks (e.g. NFSv4) and do not enable the WAL journal mode.
+
+    Args:
+        path (PathLike): path of the SQLite file, created if needed.
+        lease (float): seconds after which a claimed job can be claimed again.
+            Must be longer than the longest solve.
+        timeout (float): seconds to wait for the lock of the ledger.
+    """
+
+    def __init__(self, path, lease=3600, timeout=60):
+        self.path = Path(path)
+        self.lease = lease
+        # autocommit, transactions are explicit
+        self.db = sqlite3.connect(self.path, timeout=timeout, isolation_level=None)
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getitem__(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __setitem__(self, key, value):
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    def add_jobs(self, buildings, param_sets=({},)):
+        """Register a job for each building and parameter set.
+
+        Jobs that are already registered are left untouched, so that submitting
+        the same batch again only adds the new jobs.
+
+        Args:
+            buildings (list of str): building ids.
+            param_sets (list of dict): keyword arguments of create_model.
+
+        Returns:
+            int: number of new jobs.
+        """
+        rows = [
+            (building, json.dumps(params, sort_keys=True))
+            for building in buildings
+            for params in param_sets
+        ]
+        with self._transaction():
+            before = self.db.total_changes
+            self.db.executemany(
+                "INSERT OR IGNORE INTO jobs (building, params) VALUES (?, ?)", rows
+            )
+            return self.db.total_changes - before
+
+    def claim(self, worker=None):
+        """Claim the next pending or abandoned job.
+
+        Args:
+            worker (str): name of the worker, "host:pid" by default.
+
+        Returns:
+            tuple: (job id, building id, parameters dict), or None if no job is
+            left to claim.
+        """
+        worker = _worker_name(worker)
+        now = time.time()
+        with self._transaction():
+            row = self.db.execute(
+                "SELECT id, building, params FROM jobs WHERE status = 'pending' "
+                "OR (status = 'running' AND claimed_at < ?) ORDER BY id LIMIT 1",
+                (now - self.lease,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, claimed_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker, now, row[0]),
+            )
+        return row[0], row[1], json.loads(row[2])
+
+    def complete(self, job_id, objective=None, result=None, worker=None):
+        """Mark a job as done, with its objective value and result file.
+
+        Only a running job claimed by `worker` is updated, so that a worker whose
+        lease expired does not overwrite the job claimed again by another one.
+
+        Args:
+            job_id (int): id of the job, as returned by :meth:`claim`.
+            objective (float): objective value of the solved model.
+            result (str): path of the result file.
+            worker (str): name of the worker that claimed the job, "host:pid"
+                by default.
+
+        Returns:
+            bool: True if the job was updated.
+        """
+        return (
+            self.db.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, objective = ?, "
+                "result = ?, error = NULL "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), objective, result, job_id, _worker_name(worker)),
+            ).rowcount
+            == 1
+        )
+
+    def fail(self, job_id, error, worker=None):
+        """Mark a job as failed, with the error message.
+
+        Like :meth:`complete`, only a running job claimed by `worker` is updated.
+
+        Returns:
+            bool: True if the job was updated.
+        """
+        return (
+            self.db.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time(), error, job_id, _worker_name(worker)),
+            ).rowcount
+            == 1
+        )
+
+    def retry_failed(self):
+        """Make the failed jobs pending again and return their number."""
+        return self.db.execute(
+            "UPDATE jobs SET status = 'pending' WHERE status = 'failed'"
+        ).rowcount
+
+    def results(self):
+        """Return the (building id, parameters dict, objective) of the done
+        jobs."""
+        rows = self.db.execute(
+            "SELECT building, params, objective FROM jobs "
+            "WHERE status = 'done' AND objective IS NOT NULL ORDER BY id"
+        )
+        return [(building, json.loads(p), objective) for building, p, objective in rows]
+
+    def status(self, window=3600):
+        """Return the progress of the batch.
+
+        Args:
+            window (float): the throughput is measured over the jobs finished in
+                the last `window` seconds.
+
+        Returns:
+            dict: number of jobs per status ("pending", "running", "done",
+            "failed" and "total"), "throughput" (jobs/h) and "eta" (seconds left,
+            None if nothing finished in the window).
+        """
+        counts = dict.fromkeys(("pending", "running", "done", "failed"), 0)
+        counts.update(
+            self.db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        )
+        counts["total"] = sum(counts.values())
+
+        now = time.time()
+        start = max(now - window, self._first_claim() or now)
+        finished = self.db.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'done' AND finished_at >= ?",
+            (start,),
+        ).fetchone()[0]
+        rate = finished / (now - start) if now > start else 0  # jobs/s
+        left = counts["pending"] + counts["running"]
+        counts["throughput"] = rate * 3600
+        counts["eta"] = left / rate if rate else None
+        return counts
+
+    def _first_claim(self):
+        return self.db.execute("SELECT MIN(claimed_at) FROM jobs").fetchone()[0]
+
+    def _transaction(self):
+        return _Transaction(self.db)
+
+
+class _Transaction:
+    """Write transaction, taking the lock of the database when it begins."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, *exc):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def submit_batch(ledger, store, param_sets=({},), buildings=None):
+    """Register the jobs of a batch run in a ledger.
+
+    Args:
+        ledger (PathLike): path of the ledger, see :class:`JobLedger`.
+        store (PathLike): path of the store created by :func:`ingest`, recorded
+            in the ledger for the workers.
+        param_sets (list of dict): keyword arguments of create_model, e.g.
+            [{"E_batt_max": 50000}, {"E_batt_max": 100000}].
+        buildings (list of str): building ids, all the buildings of the store
+            by default.
+
+    Returns:
+        int: number of new jobs.
+    """
+    from batteryopt import TimeSeriesStore
+
+    store = Path(store).realpath()
+    buildings = TimeSeriesStore(store).ids if buildings is None else buildings
+    with JobLedger(ledger) as jobs:
+        jobs["store"] = str(store)
+        return jobs.add_jobs(buildings, param_sets)
+
+
+def run_worker(ledger, out, solver=None, lease=3600, max_jobs=None, worker=None):
+    """Claim and solve the jobs of a ledger until none is left.
+
+    The results of each job are written to `out`/<building>_<job id>.csv as soon
+    as it is solved, before the job is marked as done. A worker that crashes
+    leaves its job claimed; it is solved again by another worker once its lease
+    has expired.
+
+    Args:
+        ledger (PathLike): path of the ledger created by :func:`submit_batch`.
+        out (PathLike): directory of the result files, shared by the workers.
+        solver (str or dict): solver, see :func:`run_model`. If None, the
+            winner of the past solver races.
+        lease (float): seconds after which an unfinished job is claimed again.
+        max_jobs (int): stop after this number of jobs.
+        worker (str): name of the worker, "host:pid" by default.
+
+    Returns:
+        int: number of jobs processed (solved or failed) by this worker.
+    """
+    from batteryopt import TimeSeriesStore, create_model, read_model_results
+    from batteryopt import run_model
+    from pyomo.environ import value
+
+    out = Path(out)
+    out.makedirs_p()
+    worker = _worker_name(worker)
+    processed = 0
+    with JobLedger(ledger, lease=lease) as jobs:
+        store = TimeSeriesStore(jobs["store"])
+        while max_jobs is None or processed < max_jobs:
+            job = jobs.claim(worker)
+            if job is None:
+                break
+            job_id, building, params = job
+            try:
+                model = create_model(**{**store.load(building), **params})
+                run_model(model, solver=solver)
+                result = out / f"{building}_{job_id}.csv"
+                # write then rename, so that a result file is always complete
+                tmp = f"{result}.{os.getpid()}.tmp"
+                read_model_results(model).to_csv(tmp, index_label="t")
+                os.replace(tmp, result)
+                done = jobs.complete(job_id, value(model.obj), str(result), worker)
+            except Exception:
+                print(f"Warning from run_worker: job {job_id} ({building}) failed")
+                done = jobs.fail(job_id, traceback.format_exc(), worker)
+            if not done:
+                print(
+                    f"Warning from run_worker: job {job_id} ({building}) was "
+                    f"claimed again by another worker after the lease expired"
+                )
+            processed += 1
+    return processed
+
+
+def _worker_name(worker=None):
+    """Return the name of a worker, "host:pid" by default."""
+    return worker or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def format_status(status):
+    """Return a one line summary of :meth:`JobLedger.status`."""
+    eta = status["eta"]
+    if eta is None:
+        eta = "unknown"
+    else:
+        hours, rest = divmod(int(eta), 3600)
+        eta = f"{hours}h{rest // 60:02d}m"
+    return (
+        f"{status['done']}/{status['total']} done, {status['running']} running, "
+        f"{status['pending']} pending, {status['failed']} failed, "
+        f"{status['throughput']:.1f} jobs/h, ETA {eta}"
+    )
@@ -4,98 +4,445 @@ from path import Path
 from batteryopt import run_model, read_model_results
 
 
-@click.command()
+class DefaultGroup(click.Group):
+    """Group running `default_command` when the first argument is not a command.
+
+    Keeps `batteryopt DEMAND PVGEN [OUT]` working next to the other commands.
+    """
+
+    def __init__(self, *args, default_command=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx, args):
+        help_options = ctx.help_option_names
+        if args and args[0] not in self.commands and args[0] not in help_options:
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+MODEL_OPTIONS = [
+    click.option(
+        "--p",
+        default=0.0002624,
+        type=click.FLOAT,
+        help="Price of electricity $/Wh",
+        show_default=True,
+    ),
+    click.option(
+        "--f",
+        default=0.0000791,
+        type=click.FLOAT,
+        help="Feed in tariff $/Wh",
+        show_default=True,
+    ),
+    click.option(
+        "--cmin",
+        default=100,
+        type=click.FLOAT,
+        help="minimum battery charging power (W)",
+        show_default=True,
+    ),
+    click.option(
+        "--cmax",
+        default=32000,
+        type=click.FLOAT,
+        help="maximum battery charging power (W)",
+        show_default=True,
+    ),
+    click.option(
+        "--dmin",
+        default=100,
+        type=click.FLOAT,
+        help="minimum battery discharging power (W)",
+        show_default=True,
+    ),
+    click.option(
+        "--dmax",
+        default=32000,
+        type=click.FLOAT,
+        help="maximum battery discharging power (W)",
+        show_default=True,
+    ),
+    click.option(
+        "--ceff",
+        default=1,
+        type=click.FLOAT,
+        help="charging efficiency",
+        show_default=True,
+    ),
+    click.option(
+        "--deff",
+        default=1,
+        type=click.FLOAT,
+        help="discharging efficiency",
+        show_default=True,
+    ),
+    click.option(
+        "--smin",
+        default=20000,
+        type=click.FLOAT,
+        help="battery minimum energy state of charge (Wh)",
+        show_default=True,
+    ),
+    click.option(
+        "--smax",
+        default=100000,
+        type=click.FLOAT,
+        help="battery maximum energy state of charge (Wh)",
+        show_default=True,
+    ),
+]
+
+
+def model_options(f):
+    """Add the battery and tariff options of create_model to a command."""
+    for option in reversed(MODEL_OPTIONS):
+        f = option(f)
+    return f
+
+
+@click.group(cls=DefaultGroup, default_command="run")
+def batteryopt():
+    """Optimize the schedule of a battery. Without a command, runs `run`."""
+
+
+@batteryopt.command("run")
 @click.argument("demand", type=click.File("r"))
 @click.argument("pvgen", type=click.File("r"))
+@model_options
+@click.argument("out", type=click.Path(file_okay=True), default="optim_results.xlsx")
 @click.option(
-    "--p",
-    default=0.0002624,
-    type=click.FLOAT,
-    help="Price of electricity $/Wh",
-    show_default=True,
+    "--solver",
+    help="solver name, by default the winner of the past solver races or gurobi",
 )
+def run_csv(
+    demand, pvgen, p, f, cmin, cmax, dmin, dmax, ceff, deff, smin, smax, out, solver
+):
+    """DEMAND and PVGEN are both csv files with a single column. Headers must be
+    named SUM_DEMAND and SUM_GENERATION respectively. OUT is the name of the
+    generated results excel file (default="optim_results.xlsx").
+
+    Example:
+    batteryopt data/demand_aggregated.csv data/PV_generation_aggregated.csv --p 0.00085
+    """
+    from batteryopt import create_model
+    import pandas as pd
+
+    demand = pd.read_csv(demand).SUM_DEMAND
+    pvgen = pd.read_csv(pvgen).SUM_GENERATION
+
+    model = create_model(
+        demand, pvgen, p, f, cmin, cmax, dmin, dmax, ceff, deff, smin, smax
+    )
+    _solve_and_save(model, out, solver)
+
+
+@batteryopt.command("building")
+@click.argument("store", type=click.Path(exists=True, file_okay=False))
+@click.argument("building_id")
+@model_options
+@click.argument("out", type=click.Path(file_okay=True), default="optim_results.xlsx")
 @click.option(
-    "--f",
-    default=0.0000791,
-    type=click.FLOAT,
-    help="Feed in tariff $/Wh",
-    show_default=True,
+    "--solver",
+    help="solver name, by default the winner of the past solver races or gurobi",
 )
+def run_building(
+    store,
+    building_id,
+    p,
+    f,
+    cmin,
+    cmax,
+    dmin,
+    dmax,
+    ceff,
+    deff,
+    smin,
+    smax,
+    out,
+    solver,
+):
+    """Optimize the battery of building BUILDING_ID of the STORE created by
+    `batteryopt ingest`. The price of the store is used if it has one for the
+    building, otherwise --p. OUT is the name of the generated results excel file
+    (default="optim_results.xlsx").
+
+    Example:
+    batteryopt building store aggregated
+    """
+    from batteryopt import create_model, TimeSeriesStore
+
+    series = TimeSeriesStore(store).load(building_id)
+    series.setdefault("price_of_el", p)
+    model = create_model(
+        **series,
+        feed_in_t=f,
+        P_ch_min=cmin,
+        P_ch_max=cmax,
+        P_dis_min=dmin,
+        P_dis_max=dmax,
+        eff=ceff,
+        eff_dis=deff,
+        E_batt_min=smin,
+        E_batt_max=smax,
+    )
+    _solve_and_save(model, out, solver)
+
+
+@batteryopt.command("ingest")
+@click.argument("directory", type=click.Path(exists=True, file_okay=False))
+@click.argument("out", type=click.Path(file_okay=False), default="store")
+def ingest_csv(directory, out):
+    """Convert the csv files of DIRECTORY into a memory-mapped store OUT
+    (default="store"). See `batteryopt.ingest` for the file naming.
+
+    Example:
+    batteryopt ingest data store
+    """
+    from batteryopt import ingest
+
+    store = ingest(directory, out)
+    print(f"{len(store)} buildings ingested in {Path(out).realpath()}")
+
+
+@batteryopt.command("submit")
+@click.argument("ledger", type=click.Path(dir_okay=False))
+@click.argument("store", type=click.Path(exists=True, file_okay=False))
 @click.option(
-    "--cmin",
-    default=100,
-    type=click.FLOAT,
-    help="minimum battery charging power (W)",
-    show_default=True,
+    "--params",
+    type=click.File("r"),
+    help="json file with a list of parameter sets, i.e. keyword arguments of "
+    "create_model. One job is registered per building and parameter set.",
 )
+def submit_jobs(ledger, store, params):
+    """Register the jobs of a batch run over the buildings of STORE in the
+    LEDGER, an SQLite file that can be shared by workers on several machines.
+    Submitting again only adds the new jobs.
+
+    Example:
+    batteryopt submit /shared/run.db /shared/store --params sizes.json
+    """
+    import json
+    from batteryopt import submit_batch
+
+    param_sets = json.load(params) if params else [{}]
+    added = submit_batch(ledger, store, param_sets)
+    print(f"{added} new jobs registered in {Path(ledger).realpath()}")
+
+
+@batteryopt.command("worker")
+@click.argument("ledger", type=click.Path(exists=True, dir_okay=False))
+@click.argument("out", type=click.Path(file_okay=False), default="results")
 @click.option(
-    "--cmax",
-    default=32000,
-    type=click.FLOAT,
-    help="maximum battery charging power (W)",
-    show_default=True,
+    "--solver",
+    help="solver name, by default the winner of the past solver races or gurobi",
 )
 @click.option(
-    "--dmin",
-    default=100,
+    "--lease",
+    default=3600,
     type=click.FLOAT,
-    help="minimum battery discharging power (W)",
+    help="seconds after which an unfinished job is solved again by another worker",
     show_default=True,
 )
+@click.option("--max-jobs", type=click.INT, help="stop after this number of jobs")
+def start_worker(ledger, out, solver, lease, max_jobs):
+    """Solve the jobs of LEDGER until none is left, writing the results of each
+    job in OUT (default="results"). Start any number of workers, on any number
+    of machines; restart them to resume a crashed run.
+
+    Example:
+    batteryopt worker /shared/run.db /shared/results
+    """
+    from batteryopt import run_worker
+
+    processed = run_worker(ledger, out, solver, lease=lease, max_jobs=max_jobs)
+    print(f"{processed} jobs processed")
+
+
+@batteryopt.command("status")
+@click.argument("ledger", type=click.Path(exists=True, dir_okay=False))
 @click.option(
-    "--dmax",
-    default=32000,
+    "--window",
+    default=3600,
     type=click.FLOAT,
-    help="maximum battery discharging power (W)",
+    help="seconds over which the throughput is measured",
     show_default=True,
 )
+def show_status(ledger, window):
+    """Report the progress, throughput and ETA of the batch run of LEDGER.
+
+    Example:
+    batteryopt status /shared/run.db
+    """
+    from batteryopt import JobLedger, format_status
+
+    with JobLedger(ledger) as jobs:
+        print(format_status(jobs.status(window)))
+
+
+@batteryopt.command("pareto")
+@click.argument("demand", type=click.File("r"))
+@click.argument("pvgen", type=click.File("r"))
+@model_options
+@click.argument("out", type=click.Path(dir_okay=False), default="pareto_front.csv")
 @click.option(
-    "--ceff", default=1, type=click.FLOAT, help="charging efficiency", show_default=True
-)
-@click.option(
-    "--deff",
-    default=1,
-    type=click.FLOAT,
-    help="discharging efficiency",
-    show_default=True,
+    "--emissions",
+    type=click.File("r"),
+    help="csv file with the hourly emissions factor of the grid in its first "
+    "column. Without it, the front trades the cost against the grid energy.",
 )
 @click.option(
-    "--smin",
-    default=20000,
-    type=click.FLOAT,
-    help="battery minimum energy state of charge (Wh)",
-    show_default=True,
+    "--points", default=10, type=click.INT, help="number of points", show_default=True
 )
+@click.option("--processes", type=click.INT, help="number of worker processes")
 @click.option(
-    "--smax",
-    default=100000,
-    type=click.FLOAT,
-    help="battery maximum energy state of charge (Wh)",
-    show_default=True,
+    "--solver",
+    help="solver name, by default the winner of the past solver races or gurobi",
 )
-@click.argument("out", type=click.Path(file_okay=True), default="optim_results.xlsx")
-def batteryopt(
-    demand, pvgen, p, f, cmin, cmax, dmin, dmax, ceff, deff, smin, smax, out
+def run_pareto(
+    demand,
+    pvgen,
+    p,
+    f,
+    cmin,
+    cmax,
+    dmin,
+    dmax,
+    ceff,
+    deff,
+    smin,
+    smax,
+    out,
+    emissions,
+    points,
+    processes,
+    solver,
 ):
-    """DEMAND and PVGEN are both csv files with a single column. Headers must be
-    named SUM_DEMAND and SUM_GENERATION respectively. OUT is the name of the
-    generated results excel file (default="optim_results.xlsx").
+    """Compute the Pareto front of the cost and the grid energy, or emissions,
+    of the battery of DEMAND and PVGEN (see `batteryopt run`). OUT is the name
+    of the generated csv file (default="pareto_front.csv").
 
     Example:
-    batteryopt data/demand_aggregated.csv data/PV_generation_aggregated.csv --p 0.00085
+    batteryopt pareto data/demand_aggregated.csv data/PV_generation_aggregated.csv
+    --emissions grid_co2.csv
     """
-    from batteryopt import create_model
+    from batteryopt import create_model, pareto_front
     import pandas as pd
 
     demand = pd.read_csv(demand).SUM_DEMAND
     pvgen = pd.read_csv(pvgen).SUM_GENERATION
+    if emissions:
+        emissions = pd.read_csv(emissions).iloc[:, 0]
 
     model = create_model(
         demand, pvgen, p, f, cmin, cmax, dmin, dmax, ceff, deff, smin, smax
     )
-    model = run_model(model, solver="gurobi")
+    front = pareto_front(model, emissions, points, solver, processes=processes)
+    front.to_csv(out, index=False)
+    print(front.to_string(index=False))
+    print(f"Pareto front saved in {Path(out).realpath()}")
+
+
+@batteryopt.command("retrain")
+@click.argument("ledgers", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "--out",
+    type=click.Path(dir_okay=False),
+    help="file of the surrogate, by default the one used by SavingsSurrogate.load",
+)
+@click.option(
+    "--alpha", default=1.0, type=click.FLOAT, help="ridge penalty", show_default=True
+)
+@click.option(
+    "--coverage",
+    default=0.9,
+    type=click.FLOAT,
+    help="probability covered by the error bars",
+    show_default=True,
+)
+def retrain_surrogate(ledgers, out, alpha, coverage):
+    """Train the savings surrogate on the done jobs of the batch runs of
+    LEDGERS. Run it again as new solves accumulate.
+
+    Example:
+    batteryopt retrain /shared/run.db /shared/sizing.db
+    """
+    from batteryopt import SURROGATE_PATH, train_surrogate
+
+    surrogate = train_surrogate(ledgers, out, alpha, coverage)
+    print(
+        f"surrogate trained on {surrogate.n_train} solves, error bars calibrated "
+        f"on {surrogate.n_calibration}: savings within +/-{surrogate.quantile:.1%} "
+        f"of the demand cost with probability {coverage:.0%}"
+    )
+    print(f"surrogate saved in {Path(out or SURROGATE_PATH).realpath()}")
+
+
+@batteryopt.command("tune")
+@click.argument("store", type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--solver",
+    default="gurobi",
+    help="solver to tune: gurobi, cbc or appsi_highs",
+    show_default=True,
+)
+@click.option(
+    "--sample",
+    default=5,
+    type=click.INT,
+    help="number of buildings solved with each parameter set",
+    show_default=True,
+)
+@click.option(
+    "--trials",
+    default=20,
+    type=click.INT,
+    help="number of parameter sets tried, including the solver defaults",
+    show_default=True,
+)
+@click.option(
+    "--horizon",
+    type=click.INT,
+    help="number of time steps of the models, the whole series by default",
+)
+@click.option(
+    "--timeout",
+    type=click.FLOAT,
+    help="seconds after which a solve is cancelled, by default 3 times the "
+    "slowest solve with the solver defaults",
+)
+@click.option("--seed", default=0, type=click.INT, help="seed of the search")
+def tune_parameters(store, solver, sample, trials, horizon, timeout, seed):
+    """Search the solver parameters that solve a sample of the buildings of
+    STORE fastest, and save them for the solver and horizon. `batteryopt run`
+    and the batch workers then use them for models of a similar horizon.
+
+    Example:
+    batteryopt tune store --solver gurobi --sample 5 --trials 20
+    """
+    from batteryopt import SOLVER_PROFILES, tune_solver
+
+    results = tune_solver(
+        store,
+        solver,
+        sample=sample,
+        trials=trials,
+        horizon=horizon,
+        timeout=timeout,
+        seed=seed,
+    )
+    print(results.drop(columns="seconds").to_string())
+    print(f"best parameters saved in {SOLVER_PROFILES.realpath()}")
+
+
+def _solve_and_save(model, out, solver=None):
+    model = run_model(model, solver=solver)
     # saving results to file
     df = read_model_results(model)
     df.to_excel(out, index_label="Time Step")
-    print(f"solver logs available at {Path(model.optim.options['logfile']).abspath()}")
-    print(f"results file generated at {Path(out).abspath()}")
+    # only the solvers configured by setup_solver write a log file
+    logfile = model.optim.options.get("logfile") or model.optim.options.get("log")
+    if logfile:
+        print(f"solver logs available at {Path(logfile).realpath()}")
+    print(f"results file generated at {Path(out).realpath()}")
@@ -0,0 +1,301 @@
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from pyomo.environ import *
+
+from batteryopt.core import _get_price
+
+BATTERY_DEFAULTS = dict(
+    P_ch_min=100,
+    P_ch_max=32000,
+    P_dis_min=100,
+    P_dis_max=32000,
+    eff=1,
+    eff_dis=1,
+    E_batt_min=20000,
+    E_batt_max=100000,
+)
+
+
+def create_community_model(
+    demand,
+    generation,
+    price_of_el=0.0002624,
+    feed_in_t=0.0000791,
+    batteries=None,
+):
+    """Create a model for N metered buildings sharing one or more batteries.
+
+    Each building first covers its own demand with its own PV. What is left, the
+    building surplus or the building deficit, goes to a community pool where it
+    is exchanged with the other buildings and with the shared batteries. The
+    rest is exported to or imported from the grid through the building meter.
+    Like in :func:`create_model`, the batteries are charged from PV only.
+
+    The building surplus (deficit) is known before the solve, hence export
+    (import) variables are only created for the (building, time step) pairs
+    that actually have a surplus (deficit), and the exchanged power is
+    substituted out of the model. This keeps the model at roughly one variable
+    per building and time step and one pool balance per time step.
+
+    Args:
+        demand (pd.DataFrame): Electricity demand (W) with one column per
+            building and one row per time step. Column names are used as
+            building ids.
+        generation (pd.DataFrame): PV generation (W), same shape and columns as
+            `demand`.
+        price_of_el (float or PathLike): If float, a single price is used for all
+            time steps. If a .csv is passed, the column named "PRICE" is used. Units
+            are $/Wh.
+        feed_in_t: $/Wh
+        batteries (pd.DataFrame): One row per shared battery, indexed by battery
+            id, with the columns of :data:`BATTERY_DEFAULTS`. Missing columns
+            take their default value. If None, a single battery "battery" with
+            the default parameters is used.
+    """
+    demand = pd.DataFrame(demand)
+    generation = pd.DataFrame(generation)
+    if demand.shape != generation.shape:
+        raise ValueError(
+            "demand and generation must have the same shape, got "
+            f"{demand.shape} and {generation.shape}"
+        )
+    batteries = _get_batteries(batteries)
+
+    m = ConcreteModel()
+    period, n_buildings = demand.shape
+    buildings = np.asarray(demand.columns, dtype=object)
+
+    # net load of each building, split in surplus and deficit (buildings x time)
+    net = demand.values.T.astype(float) - generation.values.T.astype(float)
+    surplus = np.where(net < 0, -net, 0.0)
+    deficit = np.where(net > 0, net, 0.0)
+    s_b, s_t = np.nonzero(surplus)
+    d_b, d_t = np.nonzero(deficit)
+    # kept on the model as arrays; sparse Params are slow to construct
+    m._surplus = (buildings[s_b], s_t, surplus[s_b, s_t])
+    m._deficit = (buildings[d_b], d_t, deficit[d_b, d_t])
+    surplus_keys = list(zip(buildings[s_b].tolist(), s_t.tolist()))
+    deficit_keys = list(zip(buildings[d_b].tolist(), d_t.tolist()))
+    surplus_bounds = dict(zip(surplus_keys, zip([0.0] * len(s_t), m._surplus[2])))
+    deficit_bounds = dict(zip(deficit_keys, zip([0.0] * len(d_t), m._deficit[2])))
+    price_of_el = _get_price(price_of_el, period)
+    batt = batteries.to_dict()
+
+    # Sets
+    m.t = Set(initialize=list(range(0, period)), ordered=True, doc="Set of timesteps")
+    m.tf = Set(
+        within=m.t,
+        initialize=list(range(0, period))[1:],
+        ordered=True,
+        doc="Set of modelled time steps",
+    )
+    m.b = Set(initialize=buildings.tolist(), ordered=True, doc="Set of buildings")
+    m.k = Set(
+        initialize=batteries.index.tolist(), ordered=True, doc="Set of shared batteries"
+    )
+    m.bt_surplus = Set(
+        dimen=2,
+        initialize=surplus_keys,
+        ordered=True,
+        doc="Building and time step pairs with a PV surplus",
+    )
+    m.bt_deficit = Set(
+        dimen=2,
+        initialize=deficit_keys,
+        ordered=True,
+        doc="Building and time step pairs with unmet demand",
+    )
+
+    # Parameters
+    m.P_elec = Param(
+        m.t,
+        initialize=price_of_el,
+        doc="Price of electricity at each time step",
+    )
+    m.P_pool_net = Param(
+        m.t,
+        initialize=dict(
+            enumerate((deficit.sum(axis=0) - surplus.sum(axis=0)).tolist())
+        ),
+        doc="community unmet demand minus community PV excess at each time step (W)",
+    )
+
+    # Variables
+    m.P_pv_export = Var(
+        m.bt_surplus,
+        domain=NonNegativeReals,
+        bounds=surplus_bounds,
+        doc="PV power sold to the grid by each building at each time step (W)",
+    )
+    m.P_grid = Var(
+        m.bt_deficit,
+        domain=NonNegativeReals,
+        bounds=deficit_bounds,
+        doc="grid electricity imported by each building at each time step (W)",
+    )
+    m.P_charge = Var(
+        m.k,
+        m.t,
+        domain=NonNegativeReals,
+        doc="power used to charge each battery from the community pool (W)",
+    )
+    m.P_discharge = Var(
+        m.k,
+        m.t,
+        domain=NonNegativeReals,
+        doc="power discharged by each battery to the community pool (W)",
+    )
+    m.E_s = Var(
+        m.k,
+        m.t,
+        domain=Reals,
+        bounds=lambda m, k, t: (batt["E_batt_min"][k], batt["E_batt_max"][k]),
+        doc="energy state of charge of each battery at each time step (Wh)",
+    )
+    m.Charging = Var(
+        m.k,
+        m.t,
+        domain=Binary,
+        doc="a binary variable that constraints charging power to prevent "
+        "charging and discharging simultaneously at each time step",
+    )
+    m.Discharging = Var(
+        m.k,
+        m.t,
+        domain=Binary,
+        doc="a binary variable that constraints discharging power to prevent "
+        "charging and discharging simultaneously at each time step",
+    )
+
+    # objective function
+    m.obj = Objective(
+        expr=quicksum(m.P_grid[b, t] * price_of_el[t] for (b, t) in deficit_keys)
+        - feed_in_t * quicksum(m.P_pv_export[b, t] for (b, t) in surplus_keys),
+        sense=minimize,
+    )
+
+    # constraints
+    exporters = _group_by_time(buildings[s_b], s_t, period)
+    importers = _group_by_time(buildings[d_b], d_t, period)
+    m.c_pool = Constraint(
+        m.t,
+        rule=lambda m, t: quicksum(m.P_grid[b, t] for b in importers[t])
+        - quicksum(m.P_pv_export[b, t] for b in exporters[t])
+        + quicksum(m.P_discharge[k, t] - m.P_charge[k, t] for k in m.k)
+        == m.P_pool_net[t],
+    )
+    m.c6 = Constraint(m.k, rule=lambda m, k: m.E_s[k, 0] == batt["E_batt_min"][k])
+    m.c10 = Constraint(
+        m.k,
+        m.t,
+        rule=lambda m, k, t: m.P_charge[k, t] >= m.Charging[k, t] * batt["P_ch_min"][k],
+    )
+    m.c11 = Constraint(
+        m.k,
+        m.t,
+        rule=lambda m, k, t: m.P_charge[k, t] <= m.Charging[k, t] * batt["P_ch_max"][k],
+    )
+    m.c12 = Constraint(
+        m.k,
+        m.t,
+        rule=lambda m, k, t: m.P_discharge[k, t]
+        >= m.Discharging[k, t] * batt["P_dis_min"][k],
+    )
+    m.c13 = Constraint(
+        m.k,
+        m.t,
+        rule=lambda m, k, t: m.P_discharge[k, t]
+        <= m.Discharging[k, t] * batt["P_dis_max"][k],
+    )
+    m.c14 = Constraint(
+        m.k, m.t, rule=lambda m, k, t: m.Charging[k, t] + m.Discharging[k, t] <= 1
+    )
+    m.c15 = Constraint(
+        m.k,
+        rule=lambda m, k: quicksum(m.P_discharge[k, t] for t in m.t)
+        <= quicksum(m.P_charge[k, t] for t in m.t),
+    )
+    m.c16 = Constraint(
+        m.k,
+        m.tf,
+        rule=lambda m, k, t: m.E_s[k, t]
+        == m.E_s[k, t - 1]
+        + (
+            batt["eff"][k] * m.P_charge[k, t]
+            - (m.P_discharge[k, t] / batt["eff_dis"][k])
+        ),
+    )
+    m.c17 = Constraint(
+        m.k,
+        rule=lambda m, k: m.E_s[k, 0]
+        == m.E_s[k, period - 1]
+        + (
+            batt["eff"][k] * m.P_charge[k, 0]
+            - (m.P_discharge[k, 0] / batt["eff_dis"][k])
+        ),
+    )
+    m.c21 = Constraint(m.k, rule=lambda m, k: m.E_s[k, 0] == m.E_s[k, period - 1])
+    return m
+
+
+def read_community_results(model):
+    """Return the building and battery results of a solved community model.
+
+    Args:
+        model (ConcreteModel): a model created with :func:`create_community_model`
+            and solved with :func:`run_model`.
+
+    Returns:
+        pd.DataFrame: long-format results with the columns "kind" ("building" or
+        "battery"), "id", "t", "variable" and "value". Building rows hold
+        P_grid, P_pv_export (only for time steps with unmet demand or PV excess
+        respectively), P_share_in and P_share_out (power received from and sent
+        to the community pool). Battery rows hold E_s, P_charge and P_discharge.
+    """
+    frames = []
+    for (ids, t, available), var, shared in (
+        (model._deficit, model.P_grid, "P_share_in"),
+        (model._surplus, model.P_pv_export, "P_share_out"),
+    ):
+        values = _values(var)
+        frames.append(_long("building", ids, t, var.name, values))
+        frames.append(_long("building", ids, t, shared, available - values))
+    k, t = zip(*model.P_charge.keys()) if len(model.P_charge) else ((), ())
+    for var in (model.E_s, model.P_charge, model.P_discharge):
+        frames.append(
+            _long("battery", np.asarray(k), np.asarray(t), var.name, _values(var))
+        )
+    return pd.concat(frames, ignore_index=True)
+
+
+def _get_batteries(batteries):
+    """Return the battery parameters as a DataFrame with all default columns."""
+    if batteries is None:
+        batteries = DataFrame([BATTERY_DEFAULTS], index=["battery"])
+    batteries = DataFrame(batteries).copy()
+    for column, default in BATTERY_DEFAULTS.items():
+        if column not in batteries:
+            batteries[column] = default
+    return batteries
+
+
+def _group_by_time(ids, t, period):
+    """Return, for each time step, the list of ids found at that time step."""
+    order = np.argsort(t, kind="stable")
+    bounds = np.searchsorted(t[order], np.arange(period + 1))
+    ids = ids[order]
+    return [ids[bounds[i] : bounds[i + 1]].tolist() for i in range(period)]
+
+
+def _values(component):
+    """Return the values of an indexed Var as an array, in index order."""
+    return np.fromiter(
+        (value(c) for c in component.values()), dtype=float, count=len(component)
+    )
+
+
+def _long(kind, ids, t, variable, values):
+    return DataFrame(
+        {"kind": kind, "id": ids, "t": t, "variable": variable, "value": values}
+    )
@@ -21,14 +21,15 @@ def create_model(
     eff_dis=1,
     E_batt_min=20000,
     E_batt_max=100000,
+    E_start=None,
 ):
     """
     Args:
         demand (pd.Series): Series with the electricity demand (W).
         generation (pd.Series): Series with the PV generation (W).
-        price_of_el (float or PathLike): If float, a single price is used for all
-            time steps. If a .csv is passed, the column named "PRICE" is used. Units
-            are $/Wh.
+        price_of_el (float, PathLike or pd.Series): If float, a single price is
+            used for all time steps. If a .csv is passed, the column named "PRICE"
+            is used. A Series holds the price of each time step. Units are $/Wh.
         feed_in_t: $/Wh
         P_ch_min: minimum battery charging power (W).
         P_ch_max: maximum battery charging power (W).
@@ -38,6 +39,8 @@ def create_model(
         eff_dis: discharging efficiency (-).
         E_batt_min: battery minimum energy state of charge (Wh).
         E_batt_max: battery maximum energy state of charge (Wh).
+        E_start: battery energy state of charge at the first time step (Wh). If
+            None, E_batt_min is used. Stored in the mutable parameter `E_start`.
     """
     m = ConcreteModel()
     period = len(demand)  # period lenght in storage_hours
@@ -51,12 +54,7 @@ def create_model(
         doc="Set of modelled time steps",
     )
 
-    if isinstance(price_of_el, (str, Path)):
-        # Use file as electricity price
-        price = pd.read_csv(price_of_el)  # read hourly electricity price from csv file
-        price_of_el = price.PRICE.to_dict()
-    else:
-        price_of_el = {k: price_of_el for k in range(0, period)}
+    price_of_el = _get_price(price_of_el, period)
 
     # Parameters
     m.P_dmd = Param(
@@ -77,6 +75,11 @@ def create_model(
         # datetime index
         doc="Generation from installed PV at each hour",
     )
+    m.E_start = Param(
+        initialize=E_batt_min if E_start is None else E_start,
+        mutable=True,
+        doc="battery energy state of charge at the first time step (Wh)",
+    )
 
     # Variables
     m.P_pv_export = Var(
@@ -144,7 +147,7 @@ def create_model(
         else Constraint.Skip,
     )
     m.c5 = Constraint(m.t, rule=lambda m, t: m.P_pv_export[t] >= 0)
-    m.c6 = Constraint(expr=m.E_s[0] == E_batt_min)
+    m.c6 = Constraint(expr=m.E_s[0] == m.E_start)
     m.c7 = Constraint(m.t, rule=lambda m, t: m.P_pv_export[t] <= m.P_pv_excess[t])
     m.c8 = Constraint(
         m.t,
@@ -204,38 +207,95 @@ def create_model(
     return m
 
 
+def _get_price(price_of_el, period):
+    """Return the electricity price as a {time step: price} dict.
+
+    Args:
+        price_of_el (float, PathLike or pd.Series): If float, a single price is
+            used for all time steps. If a .csv is passed, the column named "PRICE"
+            is used. A Series holds the price of each time step.
+        period (int): number of time steps.
+    """
+    if isinstance(price_of_el, (str, Path)):
+        # Use file as electricity price
+        price = pd.read_csv(price_of_el)  # read hourly electricity price from csv file
+        return price.PRICE.to_dict()
+    elif isinstance(price_of_el, pd.Series):
+        return price_of_el.reset_index(drop=True).to_dict()
+    else:
+        return {k: price_of_el for k in range(0, period)}
+
+
 def setup_solver(optim, logfile="solver.log"):
     """
     Args:
         optim (SolverFactoryClass): The SolverFactoryClass object.
         logfile (str): the path/name of the log file.
     """
-    if optim.name == "gurobi":
+    name = getattr(optim, "name", type(optim).__name__)
+    if name == "gurobi":
         # reference with list of option names
         # http://www.gurobi.com/documentation/5.6/reference-manual/parameters
         optim.set_options("logfile={}".format(logfile))
         # optim.set_options("timelimit=7200")  # seconds
         # optim.set_options("mipgap=5e-4")  # default = 1e-4
-    elif optim.name == "glpk":
+    elif name == "glpk":
         # reference with list of options
         # execute 'glpsol --help'
         optim.set_options("log={}".format(logfile))
         # optim.set_options("tmlim=7200")  # seconds
         # optim.set_options("mipgap=.0005")
-    elif optim.name == "cplex":
+    elif name == "cplex":
         optim.set_options("log={}".format(logfile))
     else:
         print(
             "Warning from setup_solver: no options set for solver "
-            "'{}'!".format(optim.name)
+            "'{}'!".format(name)
         )
     return optim
 
 
-def run_model(model, solver="gurobi"):
+def run_model(model, solver=None, race=None, mipgap=None, tuned=True):
+    """
+    Args:
+        model (ConcreteModel): the model, e.g. from create_model.
+        solver (str or dict): solver name, or dict with a "solver" name and solver
+            "options". If None, the configuration that won the most past races
+            (see `race`) is used, "gurobi" if less than 3 races were recorded.
+        race (list): if given, solve with all these solver configurations at
+            once in parallel processes and keep the first good result, see
+            :func:`race_model`. `solver` is then ignored.
+        mipgap (float): relative MIP gap. If None, the solver default is used
+            (1e-4 when racing).
+        tuned (bool): if True, the options found by `batteryopt tune` for the
+            solver and a similar horizon are used, see :func:`solver_profile`.
+            Options given in `solver` take precedence.
+    """
+    if race:
+        from batteryopt.race import race_model
+
+        return race_model(model, race, 1e-4 if mipgap is None else mipgap)
+    if solver is None:
+        from batteryopt.race import default_solver
+
+        solver = default_solver()
+    if isinstance(solver, dict):
+        solver, options = solver["solver"], solver.get("options", {})
+    else:
+        options = {}
+    if tuned:
+        from batteryopt.tune import solver_profile
+
+        options = {**solver_profile(solver, len(model.t)), **options}
     # solve model and read results
     model.optim = SolverFactory(solver)  # cplex, glpk, gurobi, ...
     model.optim = setup_solver(model.optim, logfile=f"{solver}_run.txt")
+    if mipgap is not None:
+        from batteryopt.race import MIPGAP_OPTIONS
+
+        model.optim.options[MIPGAP_OPTIONS.get(solver, "mipgap")] = mipgap
+    for name, value in options.items():
+        model.optim.options[name] = value
     result = model.optim.solve(model, tee=True)
     assert str(result.solver.termination_condition) == "optimal"
     return model
@@ -248,7 +308,11 @@ def read_model_results(model):
         entity_types.append("con")
     entities = []
     for entity_type in entity_types:
-        entities.extend(list_entities(model, entity_type).index.tolist())
+        listed = list_entities(model, entity_type)
+        if entity_type == "par" and not listed.empty:
+            # scalar parameters (e.g. E_start) have no time step
+            listed = listed[listed.Domain.str.len() > 0]
+        entities.extend(listed.index.tolist())
     result_cache = {}
     for entity in entities:
         result_cache[entity] = get_entity(model, entity)
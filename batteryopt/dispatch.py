@@ -0,0 +1,303 @@
+import time
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import *
+from pyomo.opt import SolverFactory
+from pyomo.solvers.plugins.solvers.persistent_solver import PersistentSolver
+
+
+class Dispatcher:
+    """Re-optimise the battery dispatch over a rolling window.
+
+    The window model is built once. Each call to :meth:`update` only changes its
+    mutable parameters (forecasts, prices and initial state of charge), warm
+    starts the solver from the previous schedule shifted in time, and re-solves.
+    With a persistent solver interface (e.g. "gurobi_persistent"), the model
+    stays loaded in the solver and only the changed constraints and the
+    objective are updated.
+
+    The physics are those of :func:`create_model`, except that the window is not
+    cyclic: the window starts from the measured state of charge and ends freely.
+    The grid import and the PV export are substituted out; the battery charges
+    from the PV excess and discharges to the unmet demand.
+
+    Latency budget: on a 96-step window, an update should stay below 200 ms,
+    mostly spent in the solver. `benchmarks/bench_dispatch.py` replays the
+    bundled year to measure it.
+
+    Args:
+        horizon (int): number of time steps of the window.
+        solver (str): solver name. Persistent interfaces avoid rewriting and
+            reloading the model at each update.
+        feed_in_t: $/Wh
+        P_ch_min: minimum battery charging power (W).
+        P_ch_max: maximum battery charging power (W).
+        P_dis_min: minimum battery discharging power (W).
+        P_dis_max: maximum battery discharging power (W).
+        eff: charging efficiency (-).
+        eff_dis: discharging efficiency (-).
+        E_batt_min: battery minimum energy state of charge (Wh).
+        E_batt_max: battery maximum energy state of charge (Wh).
+
+    Example:
+        >>> dispatcher = Dispatcher(horizon=96, solver="gurobi_persistent")
+        >>> schedule = dispatcher.update(demand_forecast, pv_forecast, soc=35000)
+        >>> schedule.loc[0, ["P_charge", "P_discharge"]]  # apply the first step
+    """
+
+    def __init__(
+        self,
+        horizon=96,
+        solver="gurobi",
+        feed_in_t=0.0000791,
+        P_ch_min=100,
+        P_ch_max=32000,
+        P_dis_min=100,
+        P_dis_max=32000,
+        eff=1,
+        eff_dis=1,
+        E_batt_min=20000,
+        E_batt_max=100000,
+    ):
+        self.horizon = horizon
+        self.model = create_window_model(
+            horizon,
+            feed_in_t,
+            P_ch_min,
+            P_ch_max,
+            P_dis_min,
+            P_dis_max,
+            eff,
+            eff_dis,
+            E_batt_min,
+            E_batt_max,
+        )
+        self.optim = SolverFactory(solver)
+        self.timings = []  # seconds per update
+        self._solved = False
+
+    def update(self, demand, generation, price=0.0002624, soc=None, shift=1):
+        """Update the forecasts and state of charge, and re-solve the window.
+
+        Args:
+            demand (array-like): demand forecast over the window (W).
+            generation (array-like): PV generation forecast over the window (W).
+            price (float or array-like): price of electricity over the window
+                ($/Wh).
+            soc (float): measured battery state of charge at the start of the
+                window (Wh). If None, the state of charge planned by the
+                previous update after `shift` time steps is used.
+            shift (int): number of time steps elapsed since the previous update,
+                at least 1. The previous schedule, shifted by `shift`, is the
+                warm start.
+
+        Returns:
+            pd.DataFrame: the schedule over the window, with the columns E_s,
+            P_charge, P_discharge, P_grid and P_pv_export.
+        """
+        start = time.perf_counter()
+        m = self.model
+        net = np.asarray(demand, dtype=float) - np.asarray(generation, dtype=float)
+        if net.shape != (self.horizon,):
+            raise ValueError(
+                f"expected forecasts of length {self.horizon}, got {net.shape}"
+            )
+        if shift < 1:
+            raise ValueError(f"shift must be at least 1, got {shift}")
+        price = np.broadcast_to(np.asarray(price, dtype=float), net.shape)
+        if soc is None and self._solved:
+            soc = m.E_s[min(shift, self.horizon) - 1].value
+        if soc is not None:
+            m.E_init = soc
+        for t, deficit, surplus, p in zip(
+            m.t, np.maximum(net, 0), np.maximum(-net, 0), price
+        ):
+            m.P_dmd_unmet[t] = deficit
+            m.P_pv_excess[t] = surplus
+            m.P_elec[t] = p
+        if self._solved:
+            self._shift_solution(shift)
+        self._solve()
+        self._solved = True
+        self.timings.append(time.perf_counter() - start)
+        return self.schedule()
+
+    def schedule(self):
+        """Return the current schedule as a DataFrame."""
+        m = self.model
+        return pd.DataFrame(
+            {
+                name: [value(c) for c in getattr(m, name).values()]
+                for name in ("E_s", "P_charge", "P_discharge", "P_grid", "P_pv_export")
+            },
+            index=pd.Index(list(m.t), name="t"),
+        )
+
+    def _shift_solution(self, shift):
+        """Shift the variable values by `shift` steps, repeating the last one."""
+        m = self.model
+        for var in (m.P_charge, m.P_discharge, m.E_s, m.Charging, m.Discharging):
+            values = [var[t].value for t in m.t]
+            values = values[shift:] + values[-1:] * min(shift, self.horizon)
+            for t, v in zip(m.t, values):
+                # solvers return values slightly outside of the bounds
+                lb, ub = var[t].bounds
+                v = v if lb is None else max(v, lb)
+                v = v if ub is None else min(v, ub)
+                var[t].value = round(v) if var[t].is_binary() else v
+
+    def _solve(self):
+        m = self.model
+        if isinstance(self.optim, PersistentSolver):
+            if not self._solved:
+                self.optim.set_instance(m)
+            else:
+                # constraints and objective holding mutable parameters
+                for con in (m.c6, m.c_charge, m.c_discharge):
+                    for c in con.values():
+                        self.optim.remove_constraint(c)
+                        self.optim.add_constraint(c)
+                self.optim.set_objective(m.obj)
+            result = self.optim.solve(warmstart=self._solved)
+        else:
+            warmstart = self._solved and self.optim.warm_start_capable()
+            kwds = {"warmstart": True} if warmstart else {}
+            result = self.optim.solve(m, **kwds)
+        assert str(result.solver.termination_condition) == "optimal"
+
+
+def create_window_model(
+    horizon,
+    feed_in_t=0.0000791,
+    P_ch_min=100,
+    P_ch_max=32000,
+    P_dis_min=100,
+    P_dis_max=32000,
+    eff=1,
+    eff_dis=1,
+    E_batt_min=20000,
+    E_batt_max=100000,
+):
+    """Create the rolling window model used by :class:`Dispatcher`.
+
+    Forecasts, prices and the initial state of charge are mutable parameters
+    (P_dmd_unmet, P_pv_excess, P_elec and E_init) initialized to zero, no demand
+    and no PV, and E_batt_min.
+
+    Args:
+        horizon (int): number of time steps of the window.
+        feed_in_t: $/Wh
+        P_ch_min: minimum battery charging power (W).
+        P_ch_max: maximum battery charging power (W).
+        P_dis_min: minimum battery discharging power (W).
+        P_dis_max: maximum battery discharging power (W).
+        eff: charging efficiency (-).
+        eff_dis: discharging efficiency (-).
+        E_batt_min: battery minimum energy state of charge (Wh).
+        E_batt_max: battery maximum energy state of charge (Wh).
+    """
+    m = ConcreteModel()
+
+    # Sets
+    m.t = Set(initialize=list(range(0, horizon)), ordered=True, doc="Set of timesteps")
+    m.tf = Set(
+        within=m.t,
+        initialize=list(range(0, horizon))[1:],
+        ordered=True,
+        doc="Set of modelled time steps",
+    )
+
+    # Parameters
+    m.P_dmd_unmet = Param(
+        m.t,
+        initialize=0,
+        mutable=True,
+        doc="unmet electricity demand at each time step (W)",
+    )
+    m.P_pv_excess = Param(
+        m.t,
+        initialize=0,
+        mutable=True,
+        doc="excess electricity from PV at each time step (W)",
+    )
+    m.P_elec = Param(
+        m.t, initialize=0, mutable=True, doc="Price of electricity at each time step"
+    )
+    m.E_init = Param(
+        initialize=E_batt_min,
+        mutable=True,
+        doc="battery energy state of charge before the first time step (Wh)",
+    )
+
+    # Variables
+    m.P_charge = Var(
+        m.t,
+        domain=NonNegativeReals,
+        doc="power used to charge the battery from excess PV (W)",
+    )
+    m.P_discharge = Var(
+        m.t,
+        domain=NonNegativeReals,
+        doc="power discharged by the battery to meet unmet demand (W)",
+    )
+    m.E_s = Var(
+        m.t,
+        domain=Reals,
+        bounds=(E_batt_min, E_batt_max),
+        doc="battery energy state of charge at each time step (Wh)",
+    )
+    m.Charging = Var(
+        m.t,
+        domain=Binary,
+        doc="a binary variable that constraints charging power to prevent "
+        "charging and discharging simultaneously at each time step",
+    )
+    m.Discharging = Var(
+        m.t,
+        domain=Binary,
+        doc="a binary variable that constraints discharging power to prevent "
+        "charging and discharging simultaneously at each time step",
+    )
+
+    # Expressions
+    m.P_grid = Expression(
+        m.t,
+        rule=lambda m, t: m.P_dmd_unmet[t] - m.P_discharge[t],
+        doc="grid electricity imported/bought at each time step (W)",
+    )
+    m.P_pv_export = Expression(
+        m.t,
+        rule=lambda m, t: m.P_pv_excess[t] - m.P_charge[t],
+        doc="PV power sold to the grid at each time step (W)",
+    )
+
+    # objective function
+    m.obj = Objective(
+        expr=sum(m.P_grid[t] * m.P_elec[t] - m.P_pv_export[t] * feed_in_t for t in m.t),
+        sense=minimize,
+    )
+
+    # constraints
+    m.c_charge = Constraint(m.t, rule=lambda m, t: m.P_charge[t] <= m.P_pv_excess[t])
+    m.c_discharge = Constraint(
+        m.t, rule=lambda m, t: m.P_discharge[t] <= m.P_dmd_unmet[t]
+    )
+    m.c6 = Constraint(
+        expr=m.E_s[0] == m.E_init + (eff * m.P_charge[0] - (m.P_discharge[0] / eff_dis))
+    )
+    m.c10 = Constraint(m.t, rule=lambda m, t: m.P_charge[t] >= m.Charging[t] * P_ch_min)
+    m.c11 = Constraint(m.t, rule=lambda m, t: m.P_charge[t] <= m.Charging[t] * P_ch_max)
+    m.c12 = Constraint(
+        m.t, rule=lambda m, t: m.P_discharge[t] >= m.Discharging[t] * P_dis_min
+    )
+    m.c13 = Constraint(
+        m.t, rule=lambda m, t: m.P_discharge[t] <= m.Discharging[t] * P_dis_max
+    )
+    m.c14 = Constraint(m.t, rule=lambda m, t: m.Charging[t] + m.Discharging[t] <= 1)
+    m.c16 = Constraint(
+        m.tf,
+        rule=lambda m, t: m.E_s[t]
+        == m.E_s[t - 1] + (eff * m.P_charge[t] - (m.P_discharge[t] / eff_dis)),
+    )
+    return m
@@ -0,0 +1,248 @@
+"""Key performance indicators of battery schedules.
+
+All functions take arrays whose last axis is time, e.g. a 1-D array for one
+building or a 2-D (buildings x time) array to evaluate many buildings in one
+call. Time steps are assumed to last one hour, so that W and Wh are
+interchangeable.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def self_consumption(generation, P_pv_export):
+    """Return the share of the PV generation that is used on site (-)."""
+    generation = np.sum(generation, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            generation > 0,
+            1 - np.sum(P_pv_export, axis=-1) / generation,
+            np.nan,
+        )
+
+
+def self_sufficiency(demand, P_grid):
+    """Return the share of the demand that is not imported from the grid (-)."""
+    demand = np.sum(demand, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(demand > 0, 1 - np.sum(P_grid, axis=-1) / demand, np.nan)
+
+
+def equivalent_full_cycles(P_charge, P_discharge, capacity):
+    """Return the number of equivalent full cycles of the battery.
+
+    Args:
+        P_charge (np.ndarray): battery charging power (W).
+        P_discharge (np.ndarray): battery discharging power (W).
+        capacity (float or np.ndarray): usable capacity of the battery (Wh),
+            i.e. E_batt_max - E_batt_min. One value per building is accepted.
+    """
+    throughput = np.sum(P_charge, axis=-1) + np.sum(P_discharge, axis=-1)
+    return throughput / (2 * np.asarray(capacity, dtype=float))
+
+
+def peak_import(P_grid):
+    """Return the maximum power imported from the grid (W)."""
+    return np.max(P_grid, axis=-1)
+
+
+def electricity_cost(P_grid, P_pv_export, price, feed_in_t=0.0000791):
+    """Return the electricity cost ($): imports minus PV export revenues.
+
+    Args:
+        P_grid (np.ndarray): grid electricity imported (W).
+        P_pv_export (np.ndarray): PV power sold to the grid (W).
+        price (float or np.ndarray): price of electricity ($/Wh), broadcast
+            against P_grid.
+        feed_in_t (float or np.ndarray): feed in tariff ($/Wh).
+    """
+    return np.sum(P_grid * np.asarray(price), axis=-1) - np.sum(
+        P_pv_export * np.asarray(feed_in_t), axis=-1
+    )
+
+
+def baseline_cost(demand, generation, price, feed_in_t=0.0000791):
+    """Return the electricity cost ($) of the same building without battery."""
+    net = np.asarray(demand, dtype=float) - np.asarray(generation, dtype=float)
+    return electricity_cost(np.maximum(net, 0), np.maximum(-net, 0), price, feed_in_t)
+
+
+def rainflow(x):
+    """Count the cycles of each row of `x` with the rainflow method.
+
+    The counting uses the four-point method: the turning points are pushed on a
+    stack and, while the range between the two points below the top is not
+    larger than its two neighbouring ranges, it is a full cycle and these two
+    points are removed. The ranges left on the stack are counted as half
+    cycles. The result is the same as ASTM E1049 rainflow counting. All the rows
+    are processed at once, one turning point at a time.
+
+    Args:
+        x (np.ndarray): 1-D or 2-D (rows x time) array, e.g. the battery state of
+            charge of many buildings.
+
+    Returns:
+        tuple: (rows, ranges, counts) 1-D arrays with, for each counted cycle, the
+        row of `x` it belongs to, its range and its count (1 for full cycles
+        and 0.5 for half cycles).
+    """
+    x = np.atleast_2d(np.asarray(x, dtype=float))
+
+    # keep the turning points only, at the end of plateaus
+    sign = np.sign(np.diff(x, axis=1))
+    last_move = np.where(sign != 0, np.arange(sign.shape[1]), 0)
+    np.maximum.accumulate(last_move, axis=1, out=last_move)
+    sign = np.take_along_axis(sign, last_move, axis=1)
+    keep = np.ones(x.shape, dtype=bool)
+    keep[:, 1:-1] = (sign[:, :-1] != sign[:, 1:]) & (sign[:, :-1] != 0)
+    points = _pack(x, keep)
+    n = keep.sum(axis=1)
+
+    stack = np.empty_like(points)
+    height = np.zeros(len(points), dtype=int)
+    rows, ranges = [], []
+    for j in range(points.shape[1]):
+        row = np.nonzero(n > j)[0]
+        stack[row, height[row]] = points[row, j]
+        height[row] += 1
+        # the rows whose top of stack may close a cycle
+        row = row[height[row] >= 4]
+        while len(row):
+            h = height[row]
+            a, b, c, d = (stack[row, h - k] for k in (4, 3, 2, 1))
+            inner = np.abs(c - b)
+            closed = (inner <= np.abs(b - a)) & (inner <= np.abs(d - c))
+            row, h, d = row[closed], h[closed], d[closed]
+            rows.append(row)
+            ranges.append(inner[closed])
+            stack[row, h - 3] = d
+            height[row] -= 2
+            row = row[height[row] >= 4]
+    full = len(rows)
+
+    # residual half cycles
+    r = np.abs(np.diff(stack, axis=1))
+    row, col = np.nonzero((np.arange(r.shape[1]) < height[:, None] - 1) & (r > 0))
+    rows.append(row)
+    ranges.append(r[row, col])
+    counts = [np.ones(len(a)) for a in rows[:full]] + [np.full(len(row), 0.5)]
+    return tuple(np.concatenate(a) for a in (rows, ranges, counts))
+
+
+def _pack(values, keep):
+    """Move the kept values of each row to the left and pad with NaN."""
+    order = np.argsort(~keep, axis=1, kind="stable")
+    n = keep.sum(axis=1)
+    width = max(n.max(initial=0), 1)
+    packed = np.take_along_axis(values, order[:, :width], axis=1)
+    packed[np.arange(width) >= n[:, None]] = np.nan
+    return packed
+
+
+def dod_histogram(E_s, capacity, bins=10):
+    """Return the histogram of the depth of discharge of the battery cycles.
+
+    Args:
+        E_s (np.ndarray): battery energy state of charge (Wh), 1-D or 2-D
+            (buildings x time).
+        capacity (float or np.ndarray): usable capacity of the battery (Wh), one
+            value per building is accepted.
+        bins (int): number of depth of discharge bins between 0 and 1.
+
+    Returns:
+        tuple: (histogram, edges). The histogram has shape (buildings x bins)
+        and holds the number of cycles in each depth of discharge bin.
+    """
+    E_s = np.atleast_2d(E_s)
+    rows, ranges, counts = rainflow(E_s)
+    capacity = np.broadcast_to(np.asarray(capacity, dtype=float), E_s.shape[:1])
+    dod = ranges / capacity[rows]
+    index = np.clip((dod * bins).astype(int), 0, bins - 1)
+    histogram = np.bincount(
+        rows * bins + index, weights=counts, minlength=E_s.shape[0] * bins
+    ).reshape(E_s.shape[0], bins)
+    return histogram, np.linspace(0, 1, bins + 1)
+
+
+def compute_kpis(
+    demand,
+    generation,
+    E_s,
+    P_charge,
+    P_discharge,
+    P_grid,
+    P_pv_export,
+    price=0.0002624,
+    feed_in_t=0.0000791,
+    capacity=80000,
+):
+    """Return the KPIs of one or many battery schedules.
+
+    Args:
+        demand (np.ndarray): electricity demand (W).
+        generation (np.ndarray): PV generation (W).
+        E_s (np.ndarray): battery energy state of charge (Wh).
+        P_charge (np.ndarray): battery charging power (W).
+        P_discharge (np.ndarray): battery discharging power (W).
+        P_grid (np.ndarray): grid electricity imported (W).
+        P_pv_export (np.ndarray): PV power sold to the grid (W).
+        price (float or np.ndarray): price of electricity ($/Wh).
+        feed_in_t (float or np.ndarray): feed in tariff ($/Wh).
+        capacity (float or np.ndarray): usable capacity of the battery (Wh),
+            i.e. E_batt_max - E_batt_min.
+
+    Returns:
+        pd.DataFrame: one row per building with the columns self_consumption,
+        self_sufficiency, equivalent_full_cycles, rainflow_cycles, peak_import,
+        cost, baseline_cost and savings.
+    """
+    E_s = np.atleast_2d(E_s)
+    rows, _, counts = rainflow(E_s)
+    cost = electricity_cost(P_grid, P_pv_export, price, feed_in_t)
+    baseline = baseline_cost(demand, generation, price, feed_in_t)
+    return pd.DataFrame(
+        {
+            "self_consumption": self_consumption(generation, P_pv_export),
+            "self_sufficiency": self_sufficiency(demand, P_grid),
+            "equivalent_full_cycles": equivalent_full_cycles(
+                P_charge, P_discharge, capacity
+            ),
+            "rainflow_cycles": np.bincount(
+                rows, weights=counts, minlength=E_s.shape[0]
+            ),
+            "peak_import": peak_import(P_grid),
+            "cost": cost,
+            "baseline_cost": baseline,
+            "savings": baseline - cost,
+        },
+        index=pd.RangeIndex(E_s.shape[0]),
+    )
+
+
+def kpis_from_results(results, feed_in_t=0.0000791, capacity=80000):
+    """Return the KPIs of a list of results of :func:`read_model_results`.
+
+    Args:
+        results (list of pd.DataFrame): results of models of the same length.
+        feed_in_t (float): feed in tariff ($/Wh).
+        capacity (float or np.ndarray): usable capacity of the batteries (Wh).
+
+    Returns:
+        pd.DataFrame: one row per result, see :func:`compute_kpis`.
+    """
+
+    def stack(column):
+        return np.stack([df[column].values.astype(float) for df in results])
+
+    return compute_kpis(
+        stack("P_dmd"),
+        stack("P_pv"),
+        stack("E_s"),
+        stack("P_charge"),
+        stack("P_discharge"),
+        stack("P_grid"),
+        stack("P_pv_export"),
+        price=stack("P_elec"),
+        feed_in_t=feed_in_t,
+        capacity=capacity,
+    )
@@ -0,0 +1,203 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import (
+    Constraint,
+    Expression,
+    Objective,
+    Param,
+    Reals,
+    value,
+)
+
+from batteryopt.race import _config, _solver, default_solver
+
+# components added to the model by pareto_front
+PARETO_COMPONENTS = ["EF", "impact", "eps", "c_eps", "cost_max", "c_cost", "obj_impact"]
+# relative tolerance of the bounds set at the ends of the front
+TOLERANCE = 1e-6
+
+
+def pareto_front(
+    model, emissions=None, points=10, solver=None, mipgap=None, processes=None
+):
+    """Compute the Pareto front of the cost and the grid impact of a model with
+    the epsilon-constraint method.
+
+    The grid impact is the energy bought from the grid or, if `emissions` is
+    given, the emissions of that energy. The two ends of the front are the
+    cheapest solution and the cheapest solution of least impact. The points in
+    between minimize the cost with the impact bounded by epsilon, the right-hand
+    side of the mutable constraint `model.c_eps`. Only that value changes from
+    one point to the next, so the model is built once and persistent solvers
+    (e.g. appsi_highs) only update the bound. Epsilon grows from point to point,
+    so the solution of the previous point is feasible and is given to the solver
+    as a warm start.
+
+    Needs the "fork" start method of multiprocessing (Linux and macOS) when
+    `processes` is given.
+
+    Args:
+        model (ConcreteModel): a model created with :func:`create_model`. The
+            components listed in PARETO_COMPONENTS are added to it, and it holds
+            the solution of the last point solved. The bounds on the impact and
+            the cost are deactivated on return, so that solving the model again
+            minimizes the cost alone.
+        emissions (pd.Series or array): hourly emissions factor of the grid
+            electricity, e.g. gCO2/Wh. If None, the impact is the grid energy
+            (Wh).
+        points (int): number of points of the front, including its two ends.
+        solver (str or dict): solver, see :func:`run_model`. If None, the winner
+            of the past solver races.
+        mipgap (float): relative MIP gap. If None, the solver default is used.
+        processes (int): if given, the points between the two ends are split
+            among this many worker processes, each sweeping its own range of
+            epsilon.
+
+    Returns:
+        pd.DataFrame: one row per point, from the cheapest to the least impact,
+        with the columns "epsilon" (NaN at the cheapest end), "cost" ($),
+        "grid" (Wh), "emissions" (if `emissions` is given) and "seconds". A
+        point whose solve fails has NaN values.
+    """
+    _add_epsilon(model, emissions)
+    try:
+        return _front(model, emissions, points, solver, mipgap, processes)
+    finally:
+        _reset_epsilon(model)
+
+
+def _front(model, emissions, points, solver, mipgap, processes):
+    config = _config(default_solver() if solver is None else solver)
+    optim = _solver(config, mipgap, f"{config['solver']}_pareto.txt")
+
+    # cheapest end: least cost, then the least impact of that cost
+    start = time.perf_counter()
+    _solve(optim, model, "minimizing the cost")
+    model.cost_max = value(model.obj) + max(abs(value(model.obj)), 1) * TOLERANCE
+    _set_objective(model, "obj_impact")
+    model.c_cost.activate()
+    _solve(optim, model, "minimizing the impact at least cost", warmstart=True)
+    cheapest = _point(model, np.nan, start)
+    # least impact end: least impact, then the least cost of that impact
+    start = time.perf_counter()
+    model.c_cost.deactivate()
+    _solve(optim, model, "minimizing the impact", warmstart=True)
+    model.eps = value(model.impact) + max(abs(value(model.impact)), 1) * TOLERANCE
+    _set_objective(model, "obj")
+    model.c_eps.activate()
+    _solve(optim, model, "minimizing the cost at least impact", warmstart=True)
+    cleanest = _point(model, value(model.eps), start)
+
+    # from the least impact up, so that each solution is feasible for the next
+    epsilons = np.linspace(cleanest["impact"], cheapest["impact"], points)[1:-1]
+    if processes and len(epsilons) > 1:
+        chunks = np.array_split(epsilons, min(processes, len(epsilons)))
+        ctx = multiprocessing.get_context("fork")
+        with ctx.Pool(
+            len(chunks), initializer=_init_worker, initargs=(model, config, mipgap)
+        ) as pool:
+            rows = [r for chunk in pool.map(_sweep_chunk, chunks) for r in chunk]
+    else:
+        rows = _sweep(optim, model, epsilons)
+
+    front = pd.DataFrame([cheapest] + rows[::-1] + [cleanest])
+    if emissions is None:
+        front = front.drop(columns="impact")
+    else:
+        front = front.rename(columns={"impact": "emissions"})
+    return front
+
+
+def _add_epsilon(model, emissions):
+    """Add the impact, its objective and the bounds of the impact and cost."""
+    for name in PARETO_COMPONENTS:
+        if hasattr(model, name):
+            model.del_component(name)
+    if emissions is None:
+        factors = {t: 1 for t in model.t}
+    else:
+        factors = dict(zip(model.t, np.asarray(emissions, dtype=float)))
+    model.EF = Param(model.t, initialize=factors, doc="Grid emissions factor")
+    model.impact = Expression(expr=sum(model.P_grid[t] * model.EF[t] for t in model.t))
+    model.eps = Param(initialize=float("inf"), mutable=True, within=Reals)
+    model.c_eps = Constraint(expr=model.impact <= model.eps)
+    model.c_eps.deactivate()
+    model.cost_max = Param(initialize=float("inf"), mutable=True, within=Reals)
+    model.c_cost = Constraint(expr=model.obj.expr <= model.cost_max)
+    model.c_cost.deactivate()
+    model.obj_impact = Objective(expr=model.impact)
+    model.obj_impact.deactivate()
+
+
+def _reset_epsilon(model):
+    """Lift the bounds of the impact and cost and restore the cost objective."""
+    model.c_eps.deactivate()
+    model.c_cost.deactivate()
+    model.eps = float("inf")
+    model.cost_max = float("inf")
+    _set_objective(model, "obj")
+
+
+def _sweep(optim, model, epsilons):
+    rows = []
+    for eps in epsilons:
+        start = time.perf_counter()
+        model.eps = eps
+        try:
+            _solve(optim, model, f"solving the point epsilon={eps}", warmstart=True)
+        except RuntimeError as e:
+            print(f"Warning from pareto_front: {e}")
+            row = dict.fromkeys(["cost", "grid", "impact"], np.nan)
+            rows.append(dict(row, epsilon=eps, seconds=time.perf_counter() - start))
+        else:
+            rows.append(_point(model, eps, start))
+    return rows
+
+
+def _solve(optim, model, action, warmstart=False):
+    if warmstart and getattr(optim, "warm_start_capable", lambda: False)():
+        result = optim.solve(model, warmstart=True)
+    else:
+        result = optim.solve(model)
+    status = result.solver.termination_condition
+    if str(status) != "optimal":
+        raise RuntimeError(f"{action} finished with {status}")
+
+
+def _set_objective(model, name):
+    for obj in ("obj", "obj_impact"):
+        if obj == name:
+            getattr(model, obj).activate()
+        else:
+            getattr(model, obj).deactivate()
+
+
+def _point(model, eps, start):
+    """Return the values of the solution of a point of the front."""
+    return {
+        "epsilon": eps,
+        "cost": value(model.obj),
+        "grid": sum(model.P_grid[t].value for t in model.t),
+        "impact": value(model.impact),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+_worker = {}
+
+
+def _init_worker(model, config, mipgap):
+    # the model is inherited from the forked parent, it is not pickled
+    _worker["model"] = model
+    _worker["optim"] = _solver(
+        config,
+        mipgap,
+        f"{config['solver']}_pareto_{multiprocessing.current_process().pid}.txt",
+    )
+
+
+def _sweep_chunk(epsilons):
+    return _sweep(_worker["optim"], _worker["model"], epsilons)
@@ -2,6 +2,7 @@
 
 import pandas as pd
 import pyomo.core as pyomo
+from pyomo.core.base.set import SetOperator
 
 
 def get_entity(instance, name):
@@ -29,10 +30,10 @@ def get_entity(instance, name):
     # extract values
     if isinstance(entity, pyomo.Set):
         if entity.dimen > 1:
-            results = pd.DataFrame([v + (1,) for v in entity.value])
+            results = pd.DataFrame([v + (1,) for v in entity.data()])
         else:
             # Pyomo sets don't have values, only elements
-            results = pd.DataFrame([(v, 1) for v in entity.value])
+            results = pd.DataFrame([(v, 1) for v in entity.data()])
 
         # for unconstrained sets, the column label is identical to their index
         # hence, make index equal to entity name and append underscore to name
@@ -44,20 +45,20 @@ def get_entity(instance, name):
 
     elif isinstance(entity, pyomo.Param):
         if entity.dim() > 1:
-            results = pd.DataFrame([v[0] + (v[1],) for v in entity.iteritems()])
+            results = pd.DataFrame([v[0] + (v[1],) for v in entity.items()])
         elif entity.dim() == 1:
-            results = pd.DataFrame([(v[0], v[1]) for v in entity.iteritems()])
+            results = pd.DataFrame([(v[0], v[1]) for v in entity.items()])
         else:
-            results = pd.DataFrame([(v[0], v[1].value) for v in entity.iteritems()])
+            results = pd.DataFrame([(v[0], v[1].value) for v in entity.items()])
             labels = ["None"]
 
     elif isinstance(entity, pyomo.Expression):
         if entity.dim() > 1:
-            results = pd.DataFrame([v[0] + (v[1](),) for v in entity.iteritems()])
+            results = pd.DataFrame([v[0] + (v[1](),) for v in entity.items()])
         elif entity.dim() == 1:
-            results = pd.DataFrame([(v[0], v[1]()) for v in entity.iteritems()])
+            results = pd.DataFrame([(v[0], v[1]()) for v in entity.items()])
         else:
-            results = pd.DataFrame([(v[0], v[1]()) for v in entity.iteritems()])
+            results = pd.DataFrame([(v[0], v[1]()) for v in entity.items()])
             labels = ["None"]
 
     elif isinstance(entity, pyomo.Constraint):
@@ -74,11 +75,11 @@ def get_entity(instance, name):
             )
         elif entity.dim() == 1:
             results = pd.DataFrame(
-                [(v[0], instance.dual[v[1]]) for v in entity.iteritems()]
+                [(v[0], instance.dual[v[1]]) for v in entity.items()]
             )
         else:
             results = pd.DataFrame(
-                [(v[0], instance.dual[v[1]]) for v in entity.iteritems()]
+                [(v[0], instance.dual[v[1]]) for v in entity.items()]
             )
             labels = ["None"]
 
@@ -87,13 +88,13 @@ def get_entity(instance, name):
         if entity.dim() > 1:
             # concatenate index tuples with value if entity has
             # multidimensional indices v[0]
-            results = pd.DataFrame([v[0] + (v[1].value,) for v in entity.iteritems()])
+            results = pd.DataFrame([v[0] + (v[1].value,) for v in entity.items()])
         elif entity.dim() == 1:
             # otherwise, create tuple from scalar index v[0]
-            results = pd.DataFrame([(v[0], v[1].value) for v in entity.iteritems()])
+            results = pd.DataFrame([(v[0], v[1].value) for v in entity.items()])
         else:
             # assert(entity.dim() == 0)
-            results = pd.DataFrame([(v[0], v[1].value) for v in entity.iteritems()])
+            results = pd.DataFrame([(v[0], v[1].value) for v in entity.items()])
             labels = ["None"]
 
     # check for duplicate onset names and append one to several "_" to make
@@ -169,7 +170,7 @@ def list_entities(instance, entity_type):
     # helper function to discern entities by type
     def filter_by_type(entity, entity_type):
         if entity_type == "set":
-            return isinstance(entity, pyomo.Set) and not entity.virtual
+            return isinstance(entity, pyomo.Set) and not isinstance(entity, SetOperator)
         elif entity_type == "par":
             return isinstance(entity, pyomo.Param)
         elif entity_type == "var":
@@ -226,7 +227,7 @@ def _get_onset_names(entity):
     if isinstance(entity, pyomo.Set):
         if entity.dimen > 1:
             # N-dimensional set tuples, possibly with nested set tuples within
-            if entity.domain:
+            if _domain(entity) is not None:
                 # retreive list of domain sets, which itself could be nested
                 domains = entity.domain.set_tuple
             else:
@@ -249,7 +250,7 @@ def _get_onset_names(entity):
                 labels.extend(_get_onset_names(domain_set))
 
         elif entity.dimen == 1:
-            if entity.domain:
+            if _domain(entity) is not None:
                 # 1D subset; add domain name
                 labels.append(entity.domain.name)
             else:
@@ -263,8 +264,8 @@ def _get_onset_names(entity):
         entity,
         (pyomo.Param, pyomo.Var, pyomo.Expression, pyomo.Constraint, pyomo.Objective),
     ):
-        if entity.dim() > 0 and entity._index:
-            labels = _get_onset_names(entity._index)
+        if entity.dim() > 0 and entity.index_set() is not None:
+            labels = _get_onset_names(entity.index_set())
         else:
             # zero dimensions, so no onset labels
             pass
@@ -273,3 +274,13 @@ def _get_onset_names(entity):
         raise ValueError("Unknown entity type!")
 
     return labels
+
+
+def _domain(entity):
+    """Return the domain of a set, or None if it is unrestricted.
+
+    Unrestricted Pyomo 6 sets are within the global set `Any`, which has no
+    length, so their domain cannot be tested for truth.
+    """
+    domain = getattr(entity, "domain", None)
+    return None if domain is None or domain is pyomo.Any else domain
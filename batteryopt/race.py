@@ -0,0 +1,273 @@
+import json
+import multiprocessing
+import os
+import signal
+import time
+from queue import Empty
+
+from appdirs import user_data_dir
+from path import Path
+from pyomo.environ import Var
+from pyomo.opt import SolverFactory
+
+from batteryopt.core import setup_solver
+
+# file of the statistics of the past races, read to choose the default solver
+RACE_STATS = Path(user_data_dir("batteryopt")) / "race_stats.json"
+
+# name of the relative MIP gap option of each solver
+MIPGAP_OPTIONS = {
+    "gurobi": "MIPGap",
+    "gurobi_direct": "MIPGap",
+    "gurobi_persistent": "MIPGap",
+    "cplex": "mipgap",
+    "glpk": "mipgap",
+    "cbc": "ratioGap",
+    "appsi_highs": "mip_rel_gap",
+    "highs": "mip_rel_gap",
+}
+
+
+def race_model(model, race, mipgap=1e-4, timeout=None):
+    """Solve a model with several solver configurations at once, keep the first
+    good result and cancel the others.
+
+    Each configuration runs in a forked process, in its own process group, so
+    that cancelling it also kills the solver executable it started. A result is
+    accepted as soon as it is optimal or its relative gap reaches `mipgap`; its
+    variable values are then loaded in `model`. The outcome of each
+    configuration is appended to the statistics used by
+    :func:`default_solver`.
+
+    Needs the "fork" start method of multiprocessing (Linux and macOS).
+
+    Args:
+        model (ConcreteModel): the model, e.g. from create_model.
+        race (list): solver configurations, each a solver name or a dict with a
+            "solver" name and solver "options", e.g.
+            ["gurobi", {"solver": "cbc", "options": {"threads": 4}}].
+        mipgap (float): relative MIP gap set on every configuration and required
+            to accept a result.
+        timeout (float): seconds to wait for a good result, no limit by default.
+
+    Returns:
+        ConcreteModel: the model, with the solver of the winning configuration
+        in `model.optim` and the outcome of every configuration in
+        `model.race` (list of dict with the keys "config", "status", "gap",
+        "seconds" and "won").
+    """
+    configs = [_config(c) for c in race]
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    processes = [
+        ctx.Process(
+            target=_solve_config,
+            args=(model, config, mipgap, f"{config['solver']}_race_{i}.txt", i, queue),
+            daemon=True,
+        )
+        for i, config in enumerate(configs)
+    ]
+    outcomes = [
+        {"config": _label(c), "status": "cancelled", "gap": None, "seconds": None}
+        for c in configs
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    winner, values = None, None
+    pending = set(range(len(processes)))
+    deadline = None if timeout is None else start + timeout
+    try:
+        while pending:
+            i, status, gap, values = _next_outcome(queue, processes, pending, deadline)
+            pending.discard(i)
+            outcomes[i].update(
+                status=status, gap=gap, seconds=time.perf_counter() - start
+            )
+            if values is not None and (
+                status == "optimal" or (gap is not None and gap <= mipgap)
+            ):
+                winner = i
+                break
+    except Empty:
+        pass
+    finally:
+        _cancel(processes)
+
+    for i, outcome in enumerate(outcomes):
+        outcome["won"] = i == winner
+    _record(configs, outcomes)
+    model.race = outcomes
+    if winner is None:
+        raise RuntimeError(f"no solver configuration reached a gap of {mipgap}")
+    for var, value in zip(model.component_data_objects(Var), values):
+        var.set_value(value, skip_validation=True)
+    model.optim = _solver(
+        configs[winner], mipgap, f"{configs[winner]['solver']}_run.txt"
+    )
+    print(
+        f"race won by {outcomes[winner]['config']} in "
+        f"{outcomes[winner]['seconds']:.1f} s (gap {outcomes[winner]['gap']})"
+    )
+    return model
+
+
+def default_solver(fallback="gurobi", min_races=3):
+    """Return the solver configuration that won the most past races.
+
+    Args:
+        fallback (str or dict): configuration returned if fewer than
+            `min_races` races were recorded.
+        min_races (int): minimum number of recorded races.
+
+    Returns:
+        dict: a configuration with the keys "solver" and "options".
+    """
+    stats = _read_json(RACE_STATS)
+    races = max((s["races"] for s in stats.values()), default=0)
+    if races < min_races:
+        return _config(fallback)
+    # most wins, then shortest mean winning time
+    label = min(
+        stats,
+        key=lambda k: (
+            -stats[k]["wins"],
+            stats[k]["seconds"] / max(stats[k]["wins"], 1),
+        ),
+    )
+    return stats[label]["config"]
+
+
+def _solve_config(model, config, mipgap, logfile, index, queue):
+    """Solve `model` with a configuration and put the outcome in the queue."""
+    os.setpgid(0, 0)  # own process group, to cancel the solver with it
+    try:
+        result = _solver(config, mipgap, logfile).solve(model)
+        status = str(result.solver.termination_condition)
+        values = [var.value for var in model.component_data_objects(Var)]
+        if all(v is None for v in values):
+            values = None
+        queue.put((index, status, _gap(result), values))
+    except Exception as e:
+        queue.put((index, f"error: {e}", None, None))
+
+
+def _next_outcome(queue, processes, pending, deadline=None, poll=0.5):
+    """Return the next outcome put in the queue by :func:`_solve_config`.
+
+    The queue is polled so that a process of `pending` (indices of the processes
+    that did not put their outcome yet) that died without putting it, e.g.
+    killed by the system, is reported with the status "crashed" instead of
+    being waited for.
+
+    Raises:
+        queue.Empty: if `deadline` (a time.perf_counter value) has passed.
+    """
+    while True:
+        left = None if deadline is None else deadline - time.perf_counter()
+        if left is not None and left <= 0:
+            raise Empty
+        try:
+            return queue.get(timeout=poll if left is None else min(poll, left))
+        except Empty:
+            pass
+        for i in sorted(pending):
+            if processes[i].exitcode is not None:
+                try:
+                    # the outcome may have been put just before the process exited
+                    return queue.get(timeout=poll)
+                except Empty:
+                    return i, "crashed", None, None
+
+
+def _solver(config, mipgap, logfile):
+    optim = SolverFactory(config["solver"])
+    optim = setup_solver(optim, logfile=logfile)
+    if mipgap is not None and config["solver"] in MIPGAP_OPTIONS:
+        optim.options[MIPGAP_OPTIONS[config["solver"]]] = mipgap
+    for name, value in config["options"].items():
+        optim.options[name] = value
+    return optim
+
+
+def _gap(result):
+    """Return the relative gap of a solver result, or None if unknown."""
+    try:
+        upper = float(result.problem[0].upper_bound)
+        lower = float(result.problem[0].lower_bound)
+    except (AttributeError, IndexError, TypeError, ValueError):
+        return None
+    if not (abs(upper) < float("inf") and abs(lower) < float("inf")):
+        return None
+    return abs(upper - lower) / max(abs(upper), 1e-10)
+
+
+def _cancel(processes, grace=5):
+    """Terminate the processes still running, with the solvers they started."""
+    for p in processes:
+        if p.is_alive():
+            _kill(p, signal.SIGTERM)
+    deadline = time.perf_counter() + grace
+    for p in processes:
+        p.join(max(deadline - time.perf_counter(), 0))
+        if p.is_alive():
+            _kill(p, signal.SIGKILL)
+            p.join()
+
+
+def _kill(process, sig):
+    try:
+        os.killpg(process.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        # the process did not create its process group yet, or has exited
+        try:
+            os.kill(process.pid, sig)
+        except ProcessLookupError:
+            pass
+
+
+def _config(config):
+    if isinstance(config, str):
+        return {"solver": config, "options": {}}
+    return {"solver": config["solver"], "options": dict(config.get("options", {}))}
+
+
+def _label(config):
+    """Return a short name of a configuration, e.g. "cbc[threads=4]"."""
+    options = ",".join(f"{k}={v}" for k, v in sorted(config["options"].items()))
+    return f"{config['solver']}[{options}]" if options else config["solver"]
+
+
+def _record(configs, outcomes):
+    """Add the outcomes of a race to the statistics."""
+    stats = _read_json(RACE_STATS)
+    for config, outcome in zip(configs, outcomes):
+        s = stats.setdefault(
+            outcome["config"], {"races": 0, "wins": 0, "seconds": 0.0, "config": config}
+        )
+        s["races"] += 1
+        if outcome["won"]:
+            s["wins"] += 1
+            s["seconds"] += outcome["seconds"]
+    _write_json(RACE_STATS, stats)
+
+
+def _read_json(path):
+    """Return the content of a json file, or {} if it is missing or corrupt."""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_json(path, data):
+    """Write a json file, through a temporary file so that concurrent readers
+    never see it half written."""
+    path = Path(path)
+    path.parent.makedirs_p()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+    return path
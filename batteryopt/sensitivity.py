@@ -0,0 +1,131 @@
+import pandas as pd
+from pyomo.environ import *
+
+from batteryopt.core import run_model
+
+
+def run_sensitivity(model, solver="gurobi"):
+    """Fix the binaries of a solved MILP and re-solve it as an LP with duals.
+
+    The duals and reduced costs of the LP are the marginal values of the
+    parameters for the charging/discharging and buying/selling pattern found by
+    the MILP. They are only valid locally: a change large enough to alter that
+    pattern (e.g. letting the battery charge at another hour) is not captured.
+
+    Args:
+        model (ConcreteModel): a model created with :func:`create_model` and
+            solved with :func:`run_model`.
+        solver (str): name of an LP solver that reports duals.
+
+    Returns:
+        ConcreteModel: the model with its binaries fixed, and with the `dual`
+        and `rc` suffixes populated. The binaries keep their Binary domain, so
+        unfixing them gives back the MILP.
+    """
+    binaries = [
+        var
+        for var in model.component_data_objects(Var)
+        if var.is_binary() and var.value is not None
+    ]
+    for var in binaries:
+        # relaxed, so that solvers don't see a MILP with fixed integers
+        var.domain = Reals
+        var.fix(round(var.value))
+    if not hasattr(model, "dual"):
+        model.dual = Suffix(direction=Suffix.IMPORT)
+    if not hasattr(model, "rc"):
+        model.rc = Suffix(direction=Suffix.IMPORT)
+    try:
+        return run_model(model, solver=solver)
+    finally:
+        for var in binaries:
+            var.domain = Binary
+
+
+def marginal_values(model):
+    """Return the marginal value of the scalar parameters of :func:`create_model`.
+
+    Marginal values are the change of the objective (the electricity cost, $)
+    for a unit increase of the parameter. A negative value is a saving. When the
+    parameter sits at a breakpoint of the cost, e.g. the battery is charged at
+    exactly its maximum power, increasing and decreasing it have different
+    marginal values and the solver reports one of them.
+
+    Args:
+        model (ConcreteModel): a model returned by :func:`run_sensitivity`.
+
+    Returns:
+        pd.Series: marginal values indexed by parameter name:
+
+        - E_batt_max, E_batt_min: $/Wh of battery capacity.
+        - P_ch_max, P_ch_min, P_dis_max, P_dis_min: $/W of power limit.
+        - feed_in_t: $ per $/Wh of feed in tariff.
+        - price_of_el: $ per $/Wh of electricity price, at all time steps.
+    """
+    dual = model.dual
+    return pd.Series(
+        {
+            "E_batt_max": sum(dual[model.c20[t]] for t in model.t),
+            "E_batt_min": dual[model.c6] + sum(dual[model.c19[t]] for t in model.t),
+            # the power limits are multiplied by the (fixed) binaries
+            "P_ch_max": sum(
+                dual[model.c11[t]] * model.Charging[t].value for t in model.t
+            ),
+            "P_ch_min": sum(
+                dual[model.c10[t]] * model.Charging[t].value for t in model.t
+            ),
+            "P_dis_max": sum(
+                dual[model.c13[t]] * model.Discharging[t].value for t in model.t
+            ),
+            "P_dis_min": sum(
+                dual[model.c12[t]] * model.Discharging[t].value for t in model.t
+            ),
+            "feed_in_t": -sum(model.P_pv_export[t].value for t in model.t),
+            "price_of_el": sum(model.P_grid[t].value for t in model.t),
+        },
+        name="marginal value",
+    )
+
+
+def hourly_marginal_values(model):
+    """Return the marginal value of the time series of :func:`create_model`.
+
+    Args:
+        model (ConcreteModel): a model returned by :func:`run_sensitivity`.
+
+    Returns:
+        pd.DataFrame: marginal values indexed by time step, with the columns:
+
+        - P_elec: $ per $/Wh of electricity price at that time step.
+        - P_dmd: $/W of extra demand at that time step.
+        - P_pv: $/W of extra PV generation at that time step.
+        - P_charge, P_discharge: reduced costs, i.e. $/W of forcing the battery
+          to charge or discharge more at that time step.
+    """
+    dual = model.dual
+
+    def _dual(con, t):
+        return dual[con[t]] if t in con else 0
+
+    # P_dmd and P_pv appear in the energy balance (c23), and in the definition
+    # of the unmet demand (c3) or of the PV excess (c8). P_pv also bounds the
+    # PV export (c24).
+    return pd.DataFrame(
+        {
+            "P_elec": [model.P_grid[t].value for t in model.t],
+            "P_dmd": [
+                _dual(model.c23, t) + _dual(model.c3, t) - _dual(model.c8, t)
+                for t in model.t
+            ],
+            "P_pv": [
+                -_dual(model.c23, t)
+                - _dual(model.c3, t)
+                + _dual(model.c8, t)
+                + _dual(model.c24, t)
+                for t in model.t
+            ],
+            "P_charge": [model.rc[model.P_charge[t]] for t in model.t],
+            "P_discharge": [model.rc[model.P_discharge[t]] for t in model.t],
+        },
+        index=pd.Index(list(model.t), name="t"),
+    )
@@ -0,0 +1,229 @@
+"""Simulate battery schedules and control rules over many scenarios at once.
+
+The simulation enforces the physics of :func:`create_model`: the battery charges
+from the PV excess only and discharges to the unmet demand only, within the power
+limits (zero or between the minimum and maximum power), the state of charge bounds
+and with the charging and discharging efficiencies. Requested powers that break
+these limits are reduced, or set to zero if below the minimum power.
+
+Scenarios are the rows of 2-D (scenarios x time) arrays; 1-D arrays are shared by
+all the scenarios. The time loop is vectorized over the scenarios, which are
+processed in chunks to bound the memory.
+"""
+
+import numpy as np
+import pandas as pd
+
+from batteryopt.kpi import compute_kpis
+
+
+def simulate_scenarios(
+    demand,
+    generation,
+    P_charge=None,
+    P_discharge=None,
+    policy=None,
+    price_of_el=0.0002624,
+    feed_in_t=0.0000791,
+    P_ch_min=100,
+    P_ch_max=32000,
+    P_dis_min=100,
+    P_dis_max=32000,
+    eff=1,
+    eff_dis=1,
+    E_batt_min=20000,
+    E_batt_max=100000,
+    E_init=None,
+    chunk_size=2000,
+    return_flows=False,
+):
+    """Apply a schedule or a control rule to scenarios and return their KPIs.
+
+    Args:
+        demand (np.ndarray): electricity demand (W), 1-D or (scenarios x time).
+        generation (np.ndarray): PV generation (W), 1-D or (scenarios x time).
+        P_charge (np.ndarray): planned battery charging power (W), e.g. the
+            P_charge column of :func:`read_model_results`. 1-D or 2-D.
+        P_discharge (np.ndarray): planned battery discharging power (W).
+        policy (callable): control rule used if no schedule is given, see
+            :func:`greedy_policy` (the default) and :func:`price_threshold_policy`.
+            Called at each time step as ``policy(t, rows, E_s, surplus, deficit,
+            price)`` with the scenario indices of the chunk, the state of charge
+            before the time step and the PV excess, unmet demand and price of
+            these scenarios. Returns the requested (charge, discharge) powers.
+        price_of_el (float or np.ndarray): price of electricity ($/Wh).
+        feed_in_t (float): $/Wh
+        P_ch_min: minimum battery charging power (W).
+        P_ch_max: maximum battery charging power (W).
+        P_dis_min: minimum battery discharging power (W).
+        P_dis_max: maximum battery discharging power (W).
+        eff: charging efficiency (-).
+        eff_dis: discharging efficiency (-).
+        E_batt_min: battery minimum energy state of charge (Wh).
+        E_batt_max: battery maximum energy state of charge (Wh).
+        E_init (float or np.ndarray): battery energy state of charge before the
+            first time step (Wh). If None, E_batt_min is used. To replay a
+            solution of the cyclic :func:`create_model`, use its last E_s.
+        chunk_size (int): number of scenarios simulated together.
+        return_flows (bool): if True, also return the simulated flows.
+
+    Returns:
+        pd.DataFrame or tuple: the KPIs of each scenario, see
+        :func:`compute_kpis`. If `return_flows`, a tuple (kpis, flows) where flows
+        is a dict of (scenarios x time) arrays E_s, P_charge, P_discharge, P_grid
+        and P_pv_export.
+    """
+    if (P_charge is None) != (P_discharge is None):
+        raise ValueError("P_charge and P_discharge must be given together")
+    if P_charge is not None:
+        policy = schedule_policy(P_charge, P_discharge)
+    elif policy is None:
+        policy = greedy_policy()
+
+    inputs = [demand, generation, price_of_el]
+    if P_charge is not None:
+        inputs += [P_charge, P_discharge]
+    shape = np.broadcast(*(np.atleast_2d(x) for x in inputs)).shape
+    demand, generation, price = (
+        np.broadcast_to(np.asarray(x, dtype=float), shape)
+        for x in (demand, generation, price_of_el)
+    )
+    E_init = np.broadcast_to(
+        np.asarray(E_batt_min if E_init is None else E_init, dtype=float), shape[:1]
+    )
+
+    kpis, flows = [], []
+    for start in range(0, shape[0], chunk_size):
+        chunk_rows = slice(start, min(start + chunk_size, shape[0]))
+        rows = np.arange(shape[0])[chunk_rows]
+        chunk = _simulate_chunk(
+            rows,
+            demand[chunk_rows],
+            generation[chunk_rows],
+            price[chunk_rows],
+            policy,
+            P_ch_min,
+            P_ch_max,
+            P_dis_min,
+            P_dis_max,
+            eff,
+            eff_dis,
+            E_batt_min,
+            E_batt_max,
+            E_init[chunk_rows],
+        )
+        kpis.append(
+            compute_kpis(
+                demand[chunk_rows],
+                generation[chunk_rows],
+                **chunk,
+                price=price[chunk_rows],
+                feed_in_t=feed_in_t,
+                capacity=E_batt_max - E_batt_min,
+            ).set_index(rows)
+        )
+        if return_flows:
+            flows.append(chunk)
+    kpis = pd.concat(kpis)
+    if return_flows:
+        flows = {k: np.concatenate([f[k] for f in flows]) for k in flows[0]}
+        return kpis, flows
+    return kpis
+
+
+def _simulate_chunk(
+    rows,
+    demand,
+    generation,
+    price,
+    policy,
+    P_ch_min,
+    P_ch_max,
+    P_dis_min,
+    P_dis_max,
+    eff,
+    eff_dis,
+    E_batt_min,
+    E_batt_max,
+    E_init,
+):
+    """Simulate the scenarios `rows`, given as (rows x time) arrays."""
+    # time major, so that each time step is a contiguous row
+    net = np.ascontiguousarray((demand - generation).T)
+    deficit = np.maximum(net, 0)
+    surplus = np.maximum(-net, 0)
+    price = np.ascontiguousarray(price.T)
+    E_s, charge, discharge = (np.empty(net.shape) for _ in range(3))
+
+    E = E_init.copy()
+    headroom = np.empty_like(E)
+    for t in range(net.shape[0]):
+        ch, dis = policy(t, rows, E, surplus[t], deficit[t], price[t])
+        ch = np.minimum(ch, surplus[t], out=charge[t])
+        np.minimum(ch, P_ch_max, out=ch)
+        np.subtract(E_batt_max, E, out=headroom)
+        np.minimum(ch, headroom / eff, out=ch)
+        ch *= ch >= P_ch_min
+        dis = np.minimum(dis, deficit[t], out=discharge[t])
+        np.minimum(dis, P_dis_max, out=dis)
+        np.subtract(E, E_batt_min, out=headroom)
+        np.minimum(dis, headroom * eff_dis, out=dis)
+        dis *= dis >= P_dis_min
+        E += eff * ch
+        E -= dis / eff_dis
+        E_s[t] = E
+
+    return dict(
+        E_s=E_s.T,
+        P_charge=charge.T,
+        P_discharge=discharge.T,
+        P_grid=(deficit - discharge).T,
+        P_pv_export=(surplus - charge).T,
+    )
+
+
+def schedule_policy(P_charge, P_discharge):
+    """Return a policy requesting a planned schedule.
+
+    Args:
+        P_charge (np.ndarray): planned charging power (W), 1-D or
+            (scenarios x time).
+        P_discharge (np.ndarray): planned discharging power (W).
+    """
+    P_charge = np.atleast_2d(np.asarray(P_charge, dtype=float))
+    P_discharge = np.atleast_2d(np.asarray(P_discharge, dtype=float))
+
+    def policy(t, rows, E_s, surplus, deficit, price):
+        return (
+            P_charge[rows % len(P_charge), t],
+            P_discharge[rows % len(P_discharge), t],
+        )
+
+    return policy
+
+
+def greedy_policy():
+    """Return a policy charging all the PV excess and discharging to all the unmet
+    demand, i.e. maximizing self-consumption."""
+
+    def policy(t, rows, E_s, surplus, deficit, price):
+        return surplus, deficit
+
+    return policy
+
+
+def price_threshold_policy(threshold):
+    """Return a policy charging all the PV excess and discharging only when the
+    price of electricity is at least `threshold`.
+
+    Args:
+        threshold (float or np.ndarray): price threshold ($/Wh), one value per
+            scenario is accepted, e.g. to compare thresholds.
+    """
+    threshold = np.asarray(threshold, dtype=float)
+
+    def policy(t, rows, E_s, surplus, deficit, price):
+        limit = threshold[rows] if threshold.ndim else threshold
+        return surplus, np.where(price >= limit, deficit, 0)
+
+    return policy
@@ -0,0 +1,370 @@
+import numpy as np
+import pandas as pd
+from path import Path
+from pyomo.environ import *
+
+from batteryopt.core import _get_price
+
+
+def reduce_scenarios(scenarios, n_reduced, probabilities=None, method="forward"):
+    """Select a subset of representative scenarios and reweight them.
+
+    The scenarios are compared with the euclidean distance between their
+    flattened arrays. Probabilities of the scenarios that are not selected are
+    transferred to their closest selected scenario.
+
+    Args:
+        scenarios (np.ndarray): Array of shape (S, ...). Each scenario is flattened,
+            e.g. demand, PV and price of one scenario stacked together. Scale the
+            series beforehand if they should weigh equally.
+        n_reduced (int): number of scenarios to keep.
+        probabilities (np.ndarray): probability of each of the S scenarios. If
+            None, scenarios are equally probable.
+        method (str): "forward" for fast forward selection (Heitsch & Römisch,
+            2003) or "kmedoids" for a probability weighted k-medoids clustering
+            initialized with the forward selection.
+
+    Returns:
+        tuple: (indices, probabilities) of the selected scenarios. Indices are
+        positions in `scenarios`.
+    """
+    x = np.asarray(scenarios, dtype=float)
+    x = x.reshape(len(x), -1)
+    n = len(x)
+    if not 0 < n_reduced <= n:
+        raise ValueError(f"n_reduced must be between 1 and {n}, got {n_reduced}")
+    if probabilities is None:
+        p = np.full(n, 1 / n)
+    else:
+        p = np.asarray(probabilities, dtype=float)
+        p = p / p.sum()
+
+    # pairwise distances, using |a-b|^2 = |a|^2 + |b|^2 - 2ab
+    sq = (x**2).sum(axis=1)
+    dist = np.sqrt(np.maximum(sq[:, None] + sq[None, :] - 2 * x @ x.T, 0))
+    np.fill_diagonal(dist, 0)
+
+    if method == "forward":
+        selected = _forward_selection(dist, p, n_reduced)
+    elif method == "kmedoids":
+        selected = _kmedoids(dist, p, _forward_selection(dist, p, n_reduced))
+    else:
+        raise ValueError(f"Unknown method '{method}'")
+
+    nearest = np.argmin(dist[:, selected], axis=1)
+    return selected, np.bincount(nearest, weights=p, minlength=n_reduced)
+
+
+def _forward_selection(dist, p, n_reduced):
+    """Return the indices chosen by fast forward selection."""
+    n = len(dist)
+    unselected = np.ones(n, dtype=bool)
+    closest = np.full(n, np.inf)  # distance of each scenario to the selected set
+    selected = []
+    for _ in range(n_reduced):
+        # distance of each scenario to the selected set if candidate u was added
+        candidate = np.minimum(closest[:, None], dist)
+        z = p[unselected] @ candidate[unselected]
+        z[~unselected] = np.inf
+        u = int(np.argmin(z))
+        selected.append(u)
+        unselected[u] = False
+        closest = candidate[:, u]
+    return np.array(selected)
+
+
+def _kmedoids(dist, p, medoids, max_iter=100):
+    """Refine `medoids` by alternating assignment and medoid update steps."""
+    medoids = medoids.copy()
+    for _ in range(max_iter):
+        labels = np.argmin(dist[:, medoids], axis=1)
+        new = medoids.copy()
+        for c in range(len(medoids)):
+            members = np.flatnonzero(labels == c)
+            if not len(members):
+                # a duplicate of another medoid took all its scenarios
+                continue
+            cost = (p[members] * dist[np.ix_(members, members)]).sum(axis=1)
+            new[c] = members[np.argmin(cost)]
+        if np.array_equal(new, medoids):
+            break
+        medoids = new
+    return medoids
+
+
+def create_stochastic_model(
+    demand,
+    generation,
+    price_of_el=0.0002624,
+    probabilities=None,
+    first_stage="size",
+    feed_in_t=0.0000791,
+    battery_cost=0.03,
+    P_ch_min=100,
+    P_ch_max=32000,
+    P_dis_min=100,
+    P_dis_max=32000,
+    eff=1,
+    eff_dis=1,
+    E_batt_min=20000,
+    E_batt_max=100000,
+):
+    """Create a two-stage stochastic model over S demand/PV/price scenarios.
+
+    With `first_stage="size"`, the battery capacity `E_cap` is decided once for
+    all scenarios and the battery is dispatched in each scenario. With
+    `first_stage="schedule"`, the capacity is `E_batt_max` and a single
+    charge/discharge schedule must be feasible in every scenario, e.g. a
+    day-ahead schedule. Grid import and PV export are the recourse in both cases.
+
+    The physics are those of :func:`create_model`, with the grid import and PV
+    export substituted out: the battery charges from the PV excess only and
+    discharges to the unmet demand only.
+
+    Args:
+        demand (pd.DataFrame): Electricity demand (W) with one column per
+            scenario and one row per time step.
+        generation (pd.DataFrame): PV generation (W), same shape as `demand`.
+        price_of_el (float, PathLike, pd.Series or pd.DataFrame): $/Wh. A single
+            price, a .csv file with a "PRICE" column, one price per time step or
+            one column of prices per scenario.
+        probabilities (array-like): probability of each scenario, e.g. as
+            returned by :func:`reduce_scenarios`. If None, scenarios are equally
+            probable.
+        first_stage (str): "size" or "schedule".
+        feed_in_t: $/Wh
+        battery_cost: cost of the battery capacity over the modelled period
+            ($/Wh), only used when `first_stage="size"`. The default is an
+            annualized cost, scale it for horizons shorter than a year.
+        P_ch_min: minimum battery charging power (W).
+        P_ch_max: maximum battery charging power (W).
+        P_dis_min: minimum battery discharging power (W).
+        P_dis_max: maximum battery discharging power (W).
+        eff: charging efficiency (-).
+        eff_dis: discharging efficiency (-).
+        E_batt_min: battery minimum energy state of charge (Wh).
+        E_batt_max: battery maximum energy state of charge (Wh). Upper bound of
+            `E_cap` when `first_stage="size"`.
+    """
+    if first_stage not in ("size", "schedule"):
+        raise ValueError(f"Unknown first_stage '{first_stage}'")
+    demand = pd.DataFrame(demand)
+    generation = pd.DataFrame(generation)
+    period, n_scenarios = demand.shape
+    scenarios = list(demand.columns)
+    if probabilities is None:
+        probabilities = np.full(n_scenarios, 1 / n_scenarios)
+    if isinstance(price_of_el, (str, Path)):
+        price_of_el = pd.Series(_get_price(price_of_el, period))
+    price = np.asarray(price_of_el, dtype=float)
+    if price.ndim == 1:
+        price = price[:, None]
+    price = np.broadcast_to(price, demand.shape).T
+
+    net = demand.values.T.astype(float) - generation.values.T.astype(float)
+    surplus = np.where(net < 0, -net, 0.0)
+    deficit = np.where(net > 0, net, 0.0)
+    if first_stage == "size":
+        dispatch = scenarios
+        max_charge, max_discharge = surplus, deficit
+    else:
+        # a single schedule must be feasible in all scenarios
+        dispatch = ["schedule"]
+        max_charge = surplus.min(axis=0, keepdims=True)
+        max_discharge = deficit.min(axis=0, keepdims=True)
+    m = ConcreteModel()
+    m._first_stage = first_stage
+
+    # Sets
+    m.t = Set(initialize=list(range(0, period)), ordered=True, doc="Set of timesteps")
+    m.tf = Set(
+        within=m.t,
+        initialize=list(range(0, period))[1:],
+        ordered=True,
+        doc="Set of modelled time steps",
+    )
+    m.s = Set(initialize=scenarios, ordered=True, doc="Set of scenarios")
+    m.j = Set(initialize=dispatch, ordered=True, doc="Set of battery dispatches")
+
+    # Parameters
+    m.prob = Param(
+        m.s,
+        initialize=dict(zip(scenarios, np.asarray(probabilities, dtype=float))),
+        doc="Probability of each scenario",
+    )
+    m.P_elec = Param(
+        m.s,
+        m.t,
+        initialize=_to_dict(scenarios, price),
+        doc="Price of electricity in each scenario at each time step",
+    )
+    m.P_dmd_unmet = Param(
+        m.s,
+        m.t,
+        initialize=_to_dict(scenarios, deficit),
+        doc="unmet electricity demand in each scenario at each time step (W)",
+    )
+    m.P_pv_excess = Param(
+        m.s,
+        m.t,
+        initialize=_to_dict(scenarios, surplus),
+        doc="excess electricity from PV in each scenario at each time step (W)",
+    )
+
+    # Variables
+    m.E_cap = Var(
+        domain=NonNegativeReals,
+        bounds=(E_batt_min, E_batt_max),
+        initialize=E_batt_max,
+        doc="battery capacity (Wh), shared by all scenarios",
+    )
+    if first_stage == "schedule":
+        m.E_cap.fix(E_batt_max)
+    m.P_charge = Var(
+        m.j,
+        m.t,
+        domain=NonNegativeReals,
+        bounds=_to_dict(
+            dispatch, np.stack([np.zeros_like(max_charge), max_charge], -1)
+        ),
+        doc="power used to charge the battery from excess PV (W)",
+    )
+    m.P_discharge = Var(
+        m.j,
+        m.t,
+        domain=NonNegativeReals,
+        bounds=_to_dict(
+            dispatch, np.stack([np.zeros_like(max_discharge), max_discharge], -1)
+        ),
+        doc="power discharged by the battery to meet unmet demand (W)",
+    )
+    m.E_s = Var(
+        m.j,
+        m.t,
+        domain=Reals,
+        bounds=(E_batt_min, E_batt_max),
+        doc="battery energy state of charge at each time step (Wh)",
+    )
+    m.Charging = Var(
+        m.j,
+        m.t,
+        domain=Binary,
+        doc="a binary variable that constraints charging power to prevent "
+        "charging and discharging simultaneously at each time step",
+    )
+    m.Discharging = Var(
+        m.j,
+        m.t,
+        domain=Binary,
+        doc="a binary variable that constraints discharging power to prevent "
+        "charging and discharging simultaneously at each time step",
+    )
+
+    # Expressions
+    j_of = {s: (s if first_stage == "size" else "schedule") for s in scenarios}
+    m.P_grid = Expression(
+        m.s,
+        m.t,
+        rule=lambda m, s, t: m.P_dmd_unmet[s, t] - m.P_discharge[j_of[s], t],
+        doc="grid electricity imported/bought at each time step (W)",
+    )
+    m.P_pv_export = Expression(
+        m.s,
+        m.t,
+        rule=lambda m, s, t: m.P_pv_excess[s, t] - m.P_charge[j_of[s], t],
+        doc="PV power sold to the grid at each time step (W)",
+    )
+    m.cost = Expression(
+        m.s,
+        rule=lambda m, s: quicksum(
+            m.P_grid[s, t] * m.P_elec[s, t] - m.P_pv_export[s, t] * feed_in_t
+            for t in m.t
+        ),
+        doc="electricity cost of each scenario ($)",
+    )
+
+    # objective function
+    capacity_cost = battery_cost * m.E_cap if first_stage == "size" else 0
+    m.obj = Objective(
+        expr=capacity_cost + quicksum(m.prob[s] * m.cost[s] for s in m.s),
+        sense=minimize,
+    )
+
+    # constraints
+    m.c6 = Constraint(m.j, rule=lambda m, j: m.E_s[j, 0] == E_batt_min)
+    m.c10 = Constraint(
+        m.j, m.t, rule=lambda m, j, t: m.P_charge[j, t] >= m.Charging[j, t] * P_ch_min
+    )
+    m.c11 = Constraint(
+        m.j, m.t, rule=lambda m, j, t: m.P_charge[j, t] <= m.Charging[j, t] * P_ch_max
+    )
+    m.c12 = Constraint(
+        m.j,
+        m.t,
+        rule=lambda m, j, t: m.P_discharge[j, t] >= m.Discharging[j, t] * P_dis_min,
+    )
+    m.c13 = Constraint(
+        m.j,
+        m.t,
+        rule=lambda m, j, t: m.P_discharge[j, t] <= m.Discharging[j, t] * P_dis_max,
+    )
+    m.c14 = Constraint(
+        m.j, m.t, rule=lambda m, j, t: m.Charging[j, t] + m.Discharging[j, t] <= 1
+    )
+    m.c15 = Constraint(
+        m.j,
+        rule=lambda m, j: quicksum(m.P_discharge[j, t] for t in m.t)
+        <= quicksum(m.P_charge[j, t] for t in m.t),
+    )
+    m.c16 = Constraint(
+        m.j,
+        m.tf,
+        rule=lambda m, j, t: m.E_s[j, t]
+        == m.E_s[j, t - 1] + (eff * m.P_charge[j, t] - (m.P_discharge[j, t] / eff_dis)),
+    )
+    m.c17 = Constraint(
+        m.j,
+        rule=lambda m, j: m.E_s[j, 0]
+        == m.E_s[j, period - 1]
+        + (eff * m.P_charge[j, 0] - (m.P_discharge[j, 0] / eff_dis)),
+    )
+    m.c20 = Constraint(m.j, m.t, rule=lambda m, j, t: m.E_s[j, t] <= m.E_cap)
+    m.c21 = Constraint(m.j, rule=lambda m, j: m.E_s[j, 0] == m.E_s[j, period - 1])
+    return m
+
+
+def read_stochastic_results(model):
+    """Return the results of a solved stochastic model.
+
+    Args:
+        model (ConcreteModel): a model created with
+            :func:`create_stochastic_model` and solved with :func:`run_model`.
+
+    Returns:
+        pd.DataFrame: one row per scenario and time step with the columns E_s,
+        P_charge, P_discharge, P_grid and P_pv_export. In "schedule" mode, the
+        battery columns are the same in all scenarios. The capacity and the cost
+        of each scenario are stored in ``df.attrs["E_cap"]`` and
+        ``df.attrs["cost"]``.
+    """
+    index = pd.MultiIndex.from_product([list(model.s), list(model.t)], names=["s", "t"])
+    df = pd.DataFrame(index=index)
+    for name in ("P_grid", "P_pv_export"):
+        df[name] = [value(e) for e in getattr(model, name).values()]
+    n_t = len(model.t)
+    repeat = len(model.s) if model._first_stage == "schedule" else 1
+    for name in ("E_s", "P_charge", "P_discharge"):
+        values = np.array([v.value for v in getattr(model, name).values()])
+        df[name] = np.tile(values.reshape(-1, n_t), (repeat, 1)).ravel()
+    df.attrs["E_cap"] = value(model.E_cap)
+    df.attrs["cost"] = pd.Series({s: value(model.cost[s]) for s in model.s})
+    return df
+
+
+def _to_dict(keys, array):
+    """Return a {(key, t): value} dict from a (keys x time ...) array."""
+    return {
+        (k, t): (tuple(v) if np.ndim(v) else v)
+        for k, row in zip(keys, np.asarray(array).tolist())
+        for t, v in enumerate(row)
+    }
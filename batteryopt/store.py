@@ -0,0 +1,139 @@
+import json
+
+import numpy as np
+import pandas as pd
+from path import Path
+
+# csv column header -> series kind
+KINDS = {"SUM_DEMAND": "demand", "SUM_GENERATION": "generation", "PRICE": "price"}
+# file name parts that name the kind of series rather than the building
+KIND_TOKENS = {"demand", "pv", "generation", "price"}
+
+
+def ingest(directory, out):
+    """Convert a directory of single-column csv files into a binary store.
+
+    The kind of each file is given by its column header: SUM_DEMAND,
+    SUM_GENERATION or PRICE. The building id is the file name without the parts
+    naming the kind (demand, pv, generation, price), e.g.
+    "b001_demand.csv" and "b001_PV_generation.csv" are the demand and PV of
+    building "b001". A price file whose name is only made of such parts (e.g.
+    "Price.csv") is shared by all the buildings without their own price.
+
+    The store is a directory with one (buildings x time) float64 .npy matrix per
+    kind of series and a manifest.json holding the building ids.
+
+    Args:
+        directory (PathLike): directory with the csv files.
+        out (PathLike): directory of the store, created if needed.
+
+    Returns:
+        TimeSeriesStore: the new store.
+    """
+    series = {kind: {} for kind in KINDS.values()}
+    for file in sorted(Path(directory).files("*.csv")):
+        df = pd.read_csv(file)
+        if len(df.columns) != 1 or df.columns[0] not in KINDS:
+            print(f"Warning from ingest: skipping '{file}', unknown column(s)")
+            continue
+        kind = KINDS[df.columns[0]]
+        series[kind][_building_id(file.stem)] = df.iloc[:, 0].values
+
+    lengths = {len(v) for kind in series.values() for v in kind.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"all the series must have the same length, got {lengths}")
+    ids = sorted(set(series["demand"]) & set(series["generation"]))
+    missing = set(series["demand"]) ^ set(series["generation"])
+    if missing:
+        raise ValueError(f"buildings without both demand and PV: {sorted(missing)}")
+
+    out = Path(out)
+    out.makedirs_p()
+    for kind in ("demand", "generation"):
+        _save(out / f"{kind}.npy", [series[kind][i] for i in ids])
+    price_ids = sorted(series["price"])
+    _save(out / "price.npy", [series["price"][i] for i in price_ids])
+    shared = price_ids.index("") if "" in price_ids else None
+    manifest = {
+        "ids": ids,
+        "length": lengths.pop() if lengths else 0,
+        # row of price.npy of each building, or null
+        "price": [price_ids.index(i) if i in price_ids else shared for i in ids],
+    }
+    with open(out / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return TimeSeriesStore(out)
+
+
+class TimeSeriesStore:
+    """Read-only access to a store created by :func:`ingest`.
+
+    The matrices are memory-mapped: a building's series are read from disk when
+    accessed, without being copied, and the pages are shared by all the
+    processes reading the same store.
+
+    Example:
+        >>> store = TimeSeriesStore("store")
+        >>> model = create_model(**store.load("b001"), E_batt_max=50000)
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / "manifest.json") as f:
+            manifest = json.load(f)
+        self.ids = manifest["ids"]
+        self._rows = {building_id: i for i, building_id in enumerate(self.ids)}
+        self._price_rows = manifest["price"]
+        self.demand = np.load(self.path / "demand.npy", mmap_mode="r")
+        self.generation = np.load(self.path / "generation.npy", mmap_mode="r")
+        self.price = np.load(self.path / "price.npy", mmap_mode="r")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, building_id):
+        return building_id in self._rows
+
+    def load(self, building_id):
+        """Return the series of a building as keyword arguments of create_model.
+
+        Args:
+            building_id (str): id of the building.
+
+        Returns:
+            dict: "demand" and "generation" Series, and "price_of_el" if the
+            building has a price. The Series are views of the store.
+        """
+        try:
+            row = self._rows[building_id]
+        except KeyError:
+            raise KeyError(f"no building '{building_id}' in {self.path}")
+        kwargs = dict(
+            demand=pd.Series(self.demand[row], copy=False, name="SUM_DEMAND"),
+            generation=pd.Series(
+                self.generation[row], copy=False, name="SUM_GENERATION"
+            ),
+        )
+        if self._price_rows[row] is not None:
+            kwargs["price_of_el"] = pd.Series(
+                self.price[self._price_rows[row]], copy=False, name="PRICE"
+            )
+        return kwargs
+
+
+def _building_id(stem):
+    """Return the building id of a file name, without the kind of series."""
+    parts = stem.replace("-", "_").split("_")
+    return "_".join(p for p in parts if p.lower() not in KIND_TOKENS)
+
+
+def _save(file, rows):
+    """Save a list of equal length 1-D arrays as a (rows x time) .npy matrix."""
+    length = len(rows[0]) if rows else 0
+    matrix = np.lib.format.open_memmap(
+        file, mode="w+", dtype=np.float64, shape=(len(rows), length)
+    )
+    for i, values in enumerate(rows):
+        matrix[i] = values
+    matrix.flush()
+    del matrix
@@ -0,0 +1,369 @@
+"""Instant estimates of the savings of a battery, learned from past solves.
+
+A ridge regression predicts the annual savings of the battery (the cost without
+battery minus the objective of create_model) from a few features of the demand,
+PV and price series and of the battery parameters. The cost without battery is
+computed exactly, so the cost with battery follows from the savings. Error bars
+are split-conformal prediction intervals: the quantile of the residuals of
+solves held out of the fit, relative to the cost of the demand of each site.
+
+Example:
+    >>> surrogate = train_surrogate(["run.db"])
+    >>> surrogate.predict_inputs(demand, generation, E_batt_max=[5e4, 1e5, 2e5])
+"""
+
+import inspect
+import json
+import math
+
+import numpy as np
+import pandas as pd
+from appdirs import user_data_dir
+from path import Path
+
+from batteryopt.core import create_model
+from batteryopt.race import _write_json
+
+# file of the surrogate used by default
+SURROGATE_PATH = Path(user_data_dir("batteryopt")) / "surrogate.json"
+
+# battery and tariff parameters of create_model with their defaults
+PARAM_DEFAULTS = {
+    name: p.default
+    for name, p in inspect.signature(create_model).parameters.items()
+    if p.default is not inspect.Parameter.empty and name not in ("E_start",)
+}
+
+SURROGATE_FEATURES = [
+    # site
+    "demand_energy",  # annual demand (Wh)
+    "load_factor",  # mean / peak demand
+    "pv_ratio",  # annual PV / annual demand
+    "self_consumption",  # share of the demand met directly by PV
+    "daily_swing",  # mean daily range of the net demand / mean demand
+    "daily_variability",  # std / mean of the daily demand
+    "price_mean",  # $/Wh
+    "price_spread",  # mean daily range of the price ($/Wh)
+    # battery and tariff
+    "capacity",  # usable battery energy (Wh)
+    "P_ch_max",
+    "P_dis_max",
+    "round_trip",  # round-trip efficiency
+    "feed_in_t",
+    "shift_energy",  # annual PV surplus the battery can shift to the deficit (Wh)
+    "shift_value",  # $ saved by shifting that energy
+    # $ saved by shifting that energy to the highest price of the deficit of each
+    # day; the battery only charges from the PV surplus, never from the grid
+    "peak_shift_value",
+]
+SITE_FEATURES = SURROGATE_FEATURES[:8]
+
+
+def surrogate_features(
+    demand, generation, price_of_el=PARAM_DEFAULTS["price_of_el"], **params
+):
+    """Return the features of the surrogate for one site and any number of
+    battery and tariff parameter sets.
+
+    Args:
+        demand (pd.Series or array): electricity demand (W).
+        generation (pd.Series or array): PV generation (W).
+        price_of_el (float or pd.Series or array): price of electricity ($/Wh).
+        **params: other scalar parameters of create_model (e.g. E_batt_max,
+            feed_in_t), each a value or an array of values, one per candidate.
+
+    Returns:
+        pd.DataFrame: one row per candidate, with the SURROGATE_FEATURES, the
+        exact "baseline_cost" without battery ($) and the "demand_cost" ($)
+        used to scale the errors.
+    """
+    site = _site_stats(demand, generation, price_of_el)
+    return _candidate_features(site, params)
+
+
+class SavingsSurrogate:
+    """Ridge regression of the savings of a battery with conformal intervals.
+
+    Args:
+        alpha (float): ridge penalty, on standardized features.
+        coverage (float): probability that the actual savings fall in the
+            predicted interval.
+    """
+
+    def __init__(self, alpha=1.0, coverage=0.9):
+        self.alpha = alpha
+        self.coverage = coverage
+        self.mean = self.std = self.coef = None
+        self.intercept = 0.0
+        self.quantile = math.inf  # conformal quantile of the relative residuals
+        self.n_train = self.n_calibration = 0
+
+    def fit(self, features, savings, calibration=0.25, seed=0):
+        """Fit the regression on a part of the samples and calibrate the
+        intervals on the others.
+
+        Args:
+            features (pd.DataFrame): features from :func:`surrogate_features`.
+            savings (array): actual savings of each sample ($).
+            calibration (float): share of the samples held out to calibrate the
+                intervals.
+            seed (int): seed of the random split.
+
+        Returns:
+            SavingsSurrogate: self.
+        """
+        X = features[SURROGATE_FEATURES].to_numpy(dtype=float)
+        y = np.asarray(savings, dtype=float)
+        scale = features["demand_cost"].to_numpy(dtype=float)
+        n_cal = int(len(y) * calibration)
+        if n_cal < 1 or len(y) - n_cal < 2:
+            raise ValueError(f"not enough samples to fit the surrogate: {len(y)}")
+        order = np.random.default_rng(seed).permutation(len(y))
+        cal, train = order[:n_cal], order[n_cal:]
+
+        self.mean = X[train].mean(axis=0)
+        self.std = X[train].std(axis=0)
+        self.std[self.std == 0] = 1
+        Z = (X[train] - self.mean) / self.std
+        self.intercept = y[train].mean()
+        self.coef = np.linalg.solve(
+            Z.T @ Z + self.alpha * np.eye(Z.shape[1]),
+            Z.T @ (y[train] - self.intercept),
+        )
+
+        scores = np.sort(np.abs(y[cal] - self._predict(X[cal])) / scale[cal])
+        rank = math.ceil((n_cal + 1) * self.coverage)
+        self.quantile = scores[rank - 1] if rank <= n_cal else math.inf
+        self.n_train, self.n_calibration = len(train), n_cal
+        return self
+
+    def predict(self, features):
+        """Predict the savings and the cost with battery of candidates.
+
+        Args:
+            features (pd.DataFrame): features from :func:`surrogate_features`.
+
+        Returns:
+            pd.DataFrame: "savings", "savings_low", "savings_high", "cost",
+            "cost_low" and "cost_high" ($) of each candidate.
+        """
+        if self.coef is None:
+            raise RuntimeError("the surrogate is not fitted")
+        savings = np.maximum(
+            self._predict(features[SURROGATE_FEATURES].to_numpy(float)), 0
+        )
+        margin = self.quantile * features["demand_cost"].to_numpy(float)
+        baseline = features["baseline_cost"].to_numpy(float)
+        low = np.maximum(savings - margin, 0)
+        high = savings + margin
+        return pd.DataFrame(
+            {
+                "savings": savings,
+                "savings_low": low,
+                "savings_high": high,
+                "cost": baseline - savings,
+                "cost_low": baseline - high,
+                "cost_high": baseline - low,
+            },
+            index=features.index,
+        )
+
+    def predict_inputs(self, demand, generation, price_of_el=None, **params):
+        """Predict the savings of one site, see :func:`surrogate_features`."""
+        if price_of_el is None:
+            price_of_el = PARAM_DEFAULTS["price_of_el"]
+        features = surrogate_features(demand, generation, price_of_el, **params)
+        return self.predict(features)
+
+    def _predict(self, X):
+        return (X - self.mean) / self.std @ self.coef + self.intercept
+
+    def save(self, path=None):
+        """Save the surrogate as json, in SURROGATE_PATH by default."""
+        data = {
+            "features": SURROGATE_FEATURES,
+            "alpha": self.alpha,
+            "coverage": self.coverage,
+            "mean": self.mean.tolist(),
+            "std": self.std.tolist(),
+            "coef": self.coef.tolist(),
+            "intercept": self.intercept,
+            "quantile": self.quantile if math.isfinite(self.quantile) else None,
+            "n_train": self.n_train,
+            "n_calibration": self.n_calibration,
+        }
+        return _write_json(path or SURROGATE_PATH, data)
+
+    @classmethod
+    def load(cls, path=None):
+        """Load a surrogate saved with :meth:`save`, from SURROGATE_PATH by
+        default."""
+        with open(path or SURROGATE_PATH) as f:
+            data = json.load(f)
+        if data["features"] != SURROGATE_FEATURES:
+            raise ValueError(
+                "the surrogate was trained with other features, retrain it"
+            )
+        surrogate = cls(data["alpha"], data["coverage"])
+        surrogate.mean = np.array(data["mean"])
+        surrogate.std = np.array(data["std"])
+        surrogate.coef = np.array(data["coef"])
+        surrogate.intercept = data["intercept"]
+        if data["quantile"] is not None:
+            surrogate.quantile = data["quantile"]
+        surrogate.n_train = data["n_train"]
+        surrogate.n_calibration = data["n_calibration"]
+        return surrogate
+
+
+def training_data(ledgers):
+    """Return the features and the actual savings of the done jobs of batch runs.
+
+    Args:
+        ledgers (list of PathLike): ledgers of batch runs, see
+            :func:`submit_batch`.
+
+    Returns:
+        tuple: (features DataFrame, savings array).
+    """
+    from batteryopt import JobLedger, TimeSeriesStore
+
+    frames, savings = [], []
+    for ledger in ledgers:
+        with JobLedger(ledger) as jobs:
+            store = TimeSeriesStore(jobs["store"])
+            results = jobs.results()
+        sites = {}  # statistics of each building and price
+        for building, params, objective in results:
+            params = dict(params)
+            series = store.load(building)
+            # as in run_worker, the parameters override the price of the store
+            price = params.pop(
+                "price_of_el",
+                series.get("price_of_el", PARAM_DEFAULTS["price_of_el"]),
+            )
+            key = (building, price if isinstance(price, (float, int, str)) else None)
+            if key not in sites:
+                sites[key] = _site_stats(series["demand"], series["generation"], price)
+            features = _candidate_features(sites[key], params)
+            frames.append(features)
+            savings.append(features["baseline_cost"].iloc[0] - objective)
+    if not frames:
+        return pd.DataFrame(columns=SURROGATE_FEATURES), np.array([])
+    return pd.concat(frames, ignore_index=True), np.array(savings)
+
+
+def train_surrogate(ledgers, path=None, alpha=1.0, coverage=0.9):
+    """Train a surrogate on the done jobs of batch runs and save it.
+
+    Args:
+        ledgers (list of PathLike): ledgers of batch runs.
+        path (PathLike): file of the surrogate, SURROGATE_PATH by default.
+        alpha (float): ridge penalty.
+        coverage (float): probability covered by the prediction intervals.
+
+    Returns:
+        SavingsSurrogate: the trained surrogate.
+    """
+    features, savings = training_data(ledgers)
+    surrogate = SavingsSurrogate(alpha, coverage).fit(features, savings)
+    surrogate.save(path)
+    return surrogate
+
+
+def _site_stats(demand, generation, price_of_el):
+    """Statistics of the series of a site, shared by all its candidates."""
+    if isinstance(price_of_el, (str, Path)):
+        price_of_el = pd.read_csv(price_of_el).PRICE
+    demand = np.asarray(demand, dtype=float)
+    generation = np.asarray(generation, dtype=float)
+    price = np.broadcast_to(np.asarray(price_of_el, dtype=float), demand.shape)
+    net = demand - generation
+    deficit = np.maximum(net, 0)
+    surplus = np.maximum(-net, 0)
+    # pad to whole days
+    days = -(-len(demand) // 24)
+
+    def _daily(x, fill=0.0):
+        return np.pad(x, (0, days * 24 - len(x)), constant_values=fill).reshape(
+            days, 24
+        )
+
+    daily_demand = _daily(demand).sum(axis=1)
+    daily_net = _daily(net, net[-1])
+    daily_price = _daily(price, price[-1])
+    demand_energy = demand.sum()
+    mean_demand = max(demand.mean(), 1e-10)
+    return {
+        "demand_energy": demand_energy,
+        "load_factor": demand.mean() / max(demand.max(), 1e-10),
+        "pv_ratio": generation.sum() / max(demand_energy, 1e-10),
+        "self_consumption": np.minimum(demand, generation).sum()
+        / max(demand_energy, 1e-10),
+        "daily_swing": np.ptp(daily_net, axis=1).mean() / mean_demand,
+        "daily_variability": daily_demand.std() / max(daily_demand.mean(), 1e-10),
+        "price_mean": price.mean(),
+        "price_spread": np.ptp(daily_price, axis=1).mean(),
+        "deficit_price": (deficit * price).sum() / max(deficit.sum(), 1e-10),
+        "hourly_surplus": _daily(surplus),
+        "hourly_deficit": _daily(deficit),
+        "daily_peak_price": np.where(_daily(deficit) > 0, daily_price, 0).max(axis=1),
+        "import_cost": (deficit * price).sum(),
+        "export": surplus.sum(),
+        "demand_cost": (demand * price).sum(),
+    }
+
+
+def _candidate_features(site, params):
+    """Features of the candidates of a site, vectorized over the parameters."""
+    unknown = set(params) - set(PARAM_DEFAULTS)
+    if unknown:
+        raise TypeError(f"unknown parameters: {sorted(unknown)}")
+    p = {
+        k: np.atleast_1d(np.asarray(params.get(k, v), dtype=float))
+        for k, v in PARAM_DEFAULTS.items()
+        if k != "price_of_el"
+    }
+    n = max(len(v) for v in p.values())
+    p = {k: np.broadcast_to(v, (n,)) for k, v in p.items()}
+    capacity = np.maximum(p["E_batt_max"] - p["E_batt_min"], 0)
+    round_trip = p["eff"] * p["eff_dis"]
+
+    # energy delivered from the PV surplus of each day, (candidates x days)
+    shift = np.minimum(
+        np.minimum(
+            _capped(site["hourly_surplus"], p["P_ch_max"]) * round_trip[:, None],
+            _capped(site["hourly_deficit"], p["P_dis_max"]),
+        ),
+        (capacity * p["eff_dis"])[:, None],
+    )
+    shift_energy = shift.sum(axis=1)
+    # the shifted energy is no longer exported
+    export_value = shift_energy * p["feed_in_t"] / np.maximum(round_trip, 1e-10)
+    shift_value = shift_energy * site["deficit_price"] - export_value
+    peak_shift_value = shift @ site["daily_peak_price"] - export_value
+
+    return pd.DataFrame(
+        {
+            **{k: np.full(n, site[k]) for k in SITE_FEATURES},
+            "capacity": capacity,
+            "P_ch_max": p["P_ch_max"],
+            "P_dis_max": p["P_dis_max"],
+            "round_trip": round_trip,
+            "feed_in_t": p["feed_in_t"],
+            "shift_energy": shift_energy,
+            "shift_value": shift_value,
+            "peak_shift_value": peak_shift_value,
+            "baseline_cost": site["import_cost"] - p["feed_in_t"] * site["export"],
+            "demand_cost": np.full(n, max(site["demand_cost"], 1e-10)),
+        }
+    )
+
+
+def _capped(hourly, power):
+    """Return the daily sums of the (days x 24) `hourly` energy capped at each
+    `power`, (candidates x days)."""
+    # candidates mostly share a few power ratings
+    powers, inverse = np.unique(power, return_inverse=True)
+    daily = np.stack([np.minimum(hourly, p).sum(axis=1) for p in powers])
+    return daily[inverse]
@@ -0,0 +1,245 @@
+import itertools
+import math
+import multiprocessing
+import os
+import time
+from datetime import datetime, timezone
+from queue import Empty
+
+import numpy as np
+import pandas as pd
+from appdirs import user_data_dir
+from path import Path
+
+from batteryopt.race import (
+    _cancel,
+    _config,
+    _label,
+    _next_outcome,
+    _read_json,
+    _solver,
+    _write_json,
+)
+
+# file of the tuned solver parameters, read by run_model
+SOLVER_PROFILES = Path(user_data_dir("batteryopt")) / "solver_profiles.json"
+
+# values tried for each solver parameter: MIP focus, heuristics, cuts, presolve
+# and threads
+SEARCH_SPACES = {
+    "gurobi": {
+        "MIPFocus": [0, 1, 2, 3],
+        "Heuristics": [0.0, 0.05, 0.2, 0.5],
+        "Cuts": [-1, 0, 1, 2, 3],
+        "Presolve": [-1, 0, 1, 2],
+        "Threads": [0, 1, 2, 4],
+    },
+    "cbc": {
+        "cuts": ["on", "off", "root", "ifmove"],
+        "heuristics": ["on", "off"],
+        "preprocess": ["on", "off", "sos", "equal"],
+        "threads": [1, 2, 4],
+    },
+    "highs": {
+        "mip_heuristic_effort": [0.0, 0.05, 0.2, 0.5],
+        "mip_detect_symmetry": [True, False],
+        "presolve": ["on", "off"],
+        "threads": [1, 2, 4],
+    },
+}
+SEARCH_SPACES["gurobi_direct"] = SEARCH_SPACES["gurobi"]
+SEARCH_SPACES["gurobi_persistent"] = SEARCH_SPACES["gurobi"]
+SEARCH_SPACES["appsi_highs"] = SEARCH_SPACES["highs"]
+
+
+def tune_solver(
+    store,
+    solver="gurobi",
+    buildings=None,
+    sample=5,
+    trials=20,
+    horizon=None,
+    timeout=None,
+    seed=0,
+    min_gain=0.05,
+    save=True,
+    **params,
+):
+    """Search the solver parameters that solve a sample of buildings fastest.
+
+    Random parameter sets from SEARCH_SPACES are tried on the sample, after the
+    solver defaults. Each solve runs in a forked process that is killed after
+    `timeout` seconds; a solve that times out or fails counts as twice the
+    timeout. The parameter set with the least mean solve time is saved in
+    SOLVER_PROFILES for the solver and the horizon of the models, and is then
+    used by :func:`run_model` for models of a similar horizon.
+
+    Needs the "fork" start method of multiprocessing (Linux and macOS).
+
+    Args:
+        store (PathLike): path of the store created by :func:`ingest`.
+        solver (str): solver name, a key of SEARCH_SPACES.
+        buildings (list of str): buildings to sample from, all by default.
+        sample (int): number of buildings solved with each parameter set.
+        trials (int): number of parameter sets tried, including the defaults.
+        horizon (int): number of time steps of the models, the whole series by
+            default.
+        timeout (float): seconds after which a solve is cancelled. By default,
+            3 times the slowest solve with the solver defaults, at least 1.
+        seed (int): seed of the random sample and search.
+        min_gain (float): the solver defaults are saved unless the best
+            parameters cut their mean solve time by at least this share, so
+            that timing noise is not saved as a profile.
+        save (bool): if True, save the best parameters in SOLVER_PROFILES.
+        **params: other keyword arguments of create_model.
+
+    Returns:
+        pd.DataFrame: one row per parameter set, from the fastest, with its
+        "options", the "mean", "median", "p90" and "max" solve times (s) and
+        the number of "timeouts".
+
+    Raises:
+        RuntimeError: if no sample building is solved with the solver defaults,
+            e.g. because the solver is not installed.
+    """
+    from batteryopt import TimeSeriesStore, create_model
+
+    if solver not in SEARCH_SPACES:
+        raise ValueError(
+            f"no parameters to tune for solver '{solver}', "
+            f"choose one of {sorted(SEARCH_SPACES)}"
+        )
+    rng = np.random.default_rng(seed)
+    store = TimeSeriesStore(store)
+    buildings = store.ids if buildings is None else list(buildings)
+    picks = rng.choice(len(buildings), min(sample, len(buildings)), replace=False)
+    buildings = [buildings[i] for i in sorted(picks)]
+    models = []
+    for building in buildings:
+        series = store.load(building)
+        if horizon is not None:
+            series = {k: v[:horizon] for k, v in series.items()}
+        models.append(create_model(**{**series, **params}))
+    length = len(models[0].t)
+
+    rows = []
+    for options in _candidates(SEARCH_SPACES[solver], trials, rng):
+        config = _config({"solver": solver, "options": options})
+        seconds = [_timed_solve(m, config, timeout) for m in models]
+        if not options and all(s is None for s in seconds):
+            # the defaults are tried first: nothing to compare the others with
+            raise RuntimeError(
+                f"no sample building was solved with the defaults of '{solver}'; "
+                f"check that the solver is installed and the models are feasible"
+            )
+        if timeout is None:
+            # calibrated on the defaults
+            timeout = max(3 * max(s for s in seconds if s is not None), 1)
+        penalized = [2 * timeout if s is None else s for s in seconds]
+        rows.append(
+            {
+                "options": options,
+                "mean": np.mean(penalized),
+                "median": np.median(penalized),
+                "p90": np.percentile(penalized, 90),
+                "max": max(penalized),
+                "timeouts": sum(s is None for s in seconds),
+                "seconds": seconds,
+            }
+        )
+        print(f"{_label(config)}: mean {rows[-1]['mean']:.2f} s")
+    results = pd.DataFrame(rows).sort_values("mean", kind="stable")
+    results = results.reset_index(drop=True)
+
+    if save:
+        best = results.iloc[0]
+        default = next(r for r in rows if not r["options"])
+        if best["mean"] > default["mean"] * (1 - min_gain):
+            best = default
+        _save_profile(
+            solver,
+            length,
+            {
+                "options": best["options"],
+                "buildings": buildings,
+                "seconds": best["seconds"],
+                "default_seconds": default["seconds"],
+                "timeout": timeout,
+                "trials": len(rows),
+                "tuned_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            },
+        )
+    return results
+
+
+def solver_profile(solver, horizon):
+    """Return the tuned options of a solver for models of `horizon` time steps.
+
+    The profile tuned for the nearest horizon is used, if it is within a factor
+    of 2 of `horizon`.
+
+    Args:
+        solver (str): solver name.
+        horizon (int): number of time steps of the model.
+
+    Returns:
+        dict: solver options, empty if the solver was not tuned.
+    """
+    profiles = _read_json(SOLVER_PROFILES).get(solver, {})
+    if not profiles:
+        return {}
+    nearest = min(profiles, key=lambda h: abs(math.log(int(h) / horizon)))
+    if abs(math.log(int(nearest) / horizon)) > math.log(2):
+        return {}
+    return dict(profiles[nearest]["options"])
+
+
+def _candidates(space, trials, rng):
+    """Return the solver defaults then `trials` - 1 random parameter sets."""
+    names = sorted(space)
+    grid = list(itertools.product(*(space[n] for n in names)))
+    picks = rng.choice(len(grid), min(trials - 1, len(grid)), replace=False)
+    return [{}] + [dict(zip(names, grid[i])) for i in sorted(picks)]
+
+
+def _timed_solve(model, config, timeout):
+    """Return the seconds taken by the solver in a forked process, or None if
+    the solve failed, crashed or timed out."""
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    process = ctx.Process(
+        target=_time_config,
+        args=(model, config, f"{config['solver']}_tune.txt", queue),
+        daemon=True,
+    )
+    process.start()
+    deadline = None if timeout is None else time.perf_counter() + timeout
+    try:
+        _, status, seconds, _ = _next_outcome(queue, [process], {0}, deadline)
+    except Empty:
+        return None
+    finally:
+        _cancel([process])
+    return seconds if status == "optimal" else None
+
+
+def _time_config(model, config, logfile, queue):
+    """Solve `model` with a configuration and put its status and the seconds
+    taken by the solve in the queue, in the place of the gap and values put by
+    :func:`_solve_config`. The fork and the transfer of the outcome are not
+    timed, and the values are not sent."""
+    os.setpgid(0, 0)  # own process group, to cancel the solver with it
+    try:
+        optim = _solver(config, None, logfile)
+        start = time.perf_counter()
+        result = optim.solve(model)
+        seconds = time.perf_counter() - start
+        queue.put((0, str(result.solver.termination_condition), seconds, None))
+    except Exception as e:
+        queue.put((0, f"error: {e}", None, None))
+
+
+def _save_profile(solver, horizon, profile):
+    profiles = _read_json(SOLVER_PROFILES)
+    profiles.setdefault(solver, {})[str(horizon)] = profile
+    _write_json(SOLVER_PROFILES, profiles)
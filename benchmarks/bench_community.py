@@ -0,0 +1,64 @@
+"""Build (and optionally solve) time of the community model versus the number of
+buildings.
+
+Buildings are synthesized from the bundled aggregated demand and PV series by
+randomly scaling and shifting them.
+
+Example:
+    python benchmarks/bench_community.py --sizes 10 50 100 500
+    python benchmarks/bench_community.py --sizes 10 50 --hours 168 --solver gurobi
+"""
+
+import argparse
+import resource
+import time
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import SolverFactory, value
+
+from batteryopt import create_community_model
+
+
+def synthesize(n_buildings, hours, seed=0):
+    """Return (demand, generation) DataFrames of `n_buildings` random buildings."""
+    rng = np.random.default_rng(seed)
+    demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND.values[:hours]
+    pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION.values[:hours]
+    shifts = rng.integers(0, 24, n_buildings)
+    demand = np.stack([np.roll(demand, s) for s in shifts], axis=1)
+    demand *= rng.uniform(0.02, 0.2, n_buildings)
+    pv = pv[:, None] * rng.uniform(0, 0.3, n_buildings)
+    return pd.DataFrame(demand), pd.DataFrame(pv)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100, 500])
+    parser.add_argument("--hours", type=int, default=8760)
+    parser.add_argument("--solver", default=None, help="also solve with this solver")
+    args = parser.parse_args()
+
+    print(
+        f"{'buildings':>9} {'variables':>10} {'build (s)':>9} {'solve (s)':>9} "
+        f"{'max RSS (MB)':>12}"
+    )
+    for n in args.sizes:
+        demand, pv = synthesize(n, args.hours)
+        start = time.perf_counter()
+        model = create_community_model(demand, pv)
+        build = time.perf_counter() - start
+        n_vars = model.nvariables()
+        solve = float("nan")
+        if args.solver:
+            start = time.perf_counter()
+            SolverFactory(args.solver).solve(model)
+            solve = time.perf_counter() - start
+            value(model.obj)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{n:>9} {n_vars:>10} {build:>9.1f} {solve:>9.1f} {rss:>12.0f}")
+        del model
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Replay the bundled year through a Dispatcher and report the update latency.
+
+At each step, the forecasts over the window are the bundled demand and PV
+series with a noise growing with the lead time, and the measured state of charge
+is the one reached by applying the first step of the previous schedule.
+
+Example:
+    python benchmarks/bench_dispatch.py --solver gurobi_persistent
+    python benchmarks/bench_dispatch.py --horizon 48 --steps 8664
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from batteryopt import Dispatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--horizon", type=int, default=96)
+    parser.add_argument("--steps", type=int, default=500)
+    parser.add_argument("--start", type=int, default=3000)
+    parser.add_argument("--solver", default="gurobi")
+    parser.add_argument("--noise", type=float, default=0.05, help="at 1 step ahead")
+    args = parser.parse_args()
+
+    demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND.values
+    pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION.values
+    price = pd.read_csv("data/Price.csv").PRICE.values
+    rng = np.random.default_rng(0)
+    lead = np.sqrt(np.arange(1, args.horizon + 1))
+
+    dispatcher = Dispatcher(horizon=args.horizon, solver=args.solver)
+    soc = 20000
+    cost = 0
+    for i in range(args.start, args.start + args.steps):
+        window = slice(i, i + args.horizon)
+        noise = 1 + args.noise * lead * rng.standard_normal((2, args.horizon))
+        schedule = dispatcher.update(
+            demand[window] * noise[0], pv[window] * noise[1], price[window], soc=soc
+        )
+        # apply the first step to the actual demand and PV
+        net = demand[i] - pv[i]
+        discharge = min(schedule.P_discharge[0], max(net, 0))
+        charge = min(schedule.P_charge[0], max(-net, 0))
+        soc += charge - discharge
+        cost += price[i] * max(net - discharge, 0) - 0.0000791 * max(-net - charge, 0)
+
+    timings = np.array(dispatcher.timings) * 1000
+    print(f"{args.steps} updates of a {args.horizon}-step window with {args.solver}")
+    print(
+        f"latency (ms): first {timings[0]:.1f}, "
+        f"median {np.median(timings[1:]):.1f}, "
+        f"p95 {np.percentile(timings[1:], 95):.1f}, max {timings[1:].max():.1f}"
+    )
+    print(f"realized cost: {cost:.2f} $")
+
+
+if __name__ == "__main__":
+    main()
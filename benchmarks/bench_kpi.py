@@ -0,0 +1,64 @@
+"""Time to compute the KPIs and depth of discharge histograms of many buildings.
+
+Schedules are random but feasible: the state of charge is a bounded random walk
+and the grid import and PV export follow from the energy balance. The vectorized
+call on the (buildings x time) arrays is compared to a loop over buildings.
+
+Example:
+    python benchmarks/bench_kpi.py --buildings 100 1000 2000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from batteryopt.kpi import compute_kpis, dod_histogram
+
+
+def synthesize(n_buildings, hours=8760, seed=0):
+    """Return a dict of (buildings x time) arrays of random schedules."""
+    rng = np.random.default_rng(seed)
+    demand = rng.uniform(0, 50000, (n_buildings, hours))
+    generation = rng.uniform(0, 50000, (n_buildings, hours))
+    net = demand - generation
+    power = rng.uniform(0, 1, (n_buildings, hours)) * np.minimum(np.abs(net), 32000)
+    charge = np.where(net < 0, power, 0)
+    discharge = np.where(net > 0, power, 0)
+    E_s = np.clip(20000 + np.cumsum(charge - discharge, axis=1), 20000, 100000)
+    return dict(
+        demand=demand,
+        generation=generation,
+        E_s=E_s,
+        P_charge=charge,
+        P_discharge=discharge,
+        P_grid=np.maximum(net, 0) - discharge,
+        P_pv_export=np.maximum(-net, 0) - charge,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buildings", type=int, nargs="+", default=[100, 1000, 2000])
+    parser.add_argument("--loop", type=int, default=100, help="buildings to loop on")
+    args = parser.parse_args()
+
+    print(f"{'buildings':>9} {'vectorized (s)':>14} {'loop (s, extrapolated)':>22}")
+    for n in args.buildings:
+        arrays = synthesize(n)
+        start = time.perf_counter()
+        compute_kpis(**arrays)
+        dod_histogram(arrays["E_s"], 80000)
+        vectorized = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(min(n, args.loop)):
+            row = {k: v[i] for k, v in arrays.items()}
+            compute_kpis(**row)
+            dod_histogram(row["E_s"], 80000)
+        loop = (time.perf_counter() - start) * n / min(n, args.loop)
+        print(f"{n:>9} {vectorized:>14.2f} {loop:>22.2f}")
+
+
+if __name__ == "__main__":
+    main()
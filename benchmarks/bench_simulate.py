@@ -0,0 +1,57 @@
+"""Time the simulation of control rules over many scenario-years.
+
+The scenarios scale the bundled PV generation and price series by random yearly
+factors, and the greedy (self-consumption) and price threshold policies are
+applied to all of them.
+
+Example:
+    python benchmarks/bench_simulate.py --scenarios 10000
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from batteryopt.simulate import (
+    greedy_policy,
+    price_threshold_policy,
+    simulate_scenarios,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND.values
+    pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION.values
+    price = pd.read_csv("data/Price.csv").PRICE.values
+    rng = np.random.default_rng(0)
+    generation = pv * rng.uniform(0.5, 1.5, size=(args.scenarios, 1))
+    prices = price * rng.uniform(0.8, 1.2, size=(args.scenarios, 1))
+
+    for name, policy in (
+        ("greedy", greedy_policy()),
+        ("threshold", price_threshold_policy(0.0003)),
+    ):
+        start = time.perf_counter()
+        kpis = simulate_scenarios(
+            demand,
+            generation,
+            policy=policy,
+            price_of_el=prices,
+            chunk_size=args.chunk_size,
+        )
+        seconds = time.perf_counter() - start
+        print(
+            f"{name:>9}: {args.scenarios} scenario-years in {seconds:.1f} s, "
+            f"mean savings {kpis.savings.mean():.0f} $"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Runtime of the stochastic model versus the number of reduced scenarios.
+
+S input scenarios are synthesized from the bundled demand and PV series with
+random daily demand and cloudiness factors, reduced with `reduce_scenarios` and
+solved with `create_stochastic_model`.
+
+Example:
+    python benchmarks/bench_stochastic.py --solver gurobi
+    python benchmarks/bench_stochastic.py --reduced 1 2 5 10 20 --hours 336
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from pyomo.environ import SolverFactory, value
+
+from batteryopt import create_stochastic_model, reduce_scenarios
+
+
+def synthesize(n_scenarios, hours, seed=0):
+    """Return (demand, generation) DataFrames with one column per scenario."""
+    rng = np.random.default_rng(seed)
+    demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND.values[:hours]
+    pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION.values[:hours]
+    days = -(-hours // 24)
+    demand_factor = np.repeat(rng.normal(1, 0.1, (n_scenarios, days)), 24, 1)
+    cloudiness = np.repeat(rng.uniform(0.2, 1.5, (n_scenarios, days)), 24, 1)
+    demand = demand * demand_factor[:, :hours]
+    pv = pv * cloudiness[:, :hours]
+    return pd.DataFrame(demand.T), pd.DataFrame(pv.T)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", type=int, default=100)
+    parser.add_argument("--reduced", type=int, nargs="+", default=[1, 2, 5, 10])
+    parser.add_argument("--hours", type=int, default=168)
+    parser.add_argument("--method", default="forward")
+    parser.add_argument("--solver", default="gurobi")
+    args = parser.parse_args()
+
+    demand, pv = synthesize(args.scenarios, args.hours)
+    x = np.stack([demand.values.T, pv.values.T], axis=1)
+    print(
+        f"{'reduced':>7} {'reduce (s)':>10} {'build (s)':>9} {'solve (s)':>9} "
+        f"{'E_cap (Wh)':>10} {'objective':>10}"
+    )
+    for n in args.reduced:
+        start = time.perf_counter()
+        idx, prob = reduce_scenarios(x, n, method=args.method)
+        reduce = time.perf_counter() - start
+        start = time.perf_counter()
+        model = create_stochastic_model(
+            demand.iloc[:, idx],
+            pv.iloc[:, idx],
+            probabilities=prob,
+            battery_cost=0.03 * args.hours / 8760,
+        )
+        build = time.perf_counter() - start
+        start = time.perf_counter()
+        SolverFactory(args.solver).solve(model)
+        solve = time.perf_counter() - start
+        print(
+            f"{n:>7} {reduce:>10.3f} {build:>9.2f} {solve:>9.2f} "
+            f"{value(model.E_cap):>10.0f} {value(model.obj):>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Compare loading a building portfolio from csv files and from a binary store.
+
+A synthetic portfolio is written as csv files (the bundled year scaled with
+noise), then ingested into a store. Each of --workers processes then loads all
+the buildings, keeps their series in memory and sums them, once from the csv
+files and once from the store. The memory is the proportional set size (PSS),
+which splits the pages shared by the workers between them (Linux only).
+
+Example:
+    python benchmarks/bench_store.py --buildings 1000 --workers 8
+"""
+
+import argparse
+import tempfile
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from path import Path
+
+from batteryopt import TimeSeriesStore, ingest
+
+
+def pss():
+    """Return the proportional set size of this process (MB)."""
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 1024
+    return np.nan
+
+
+def load_csv(args):
+    directory, ids = args
+    start = time.perf_counter()
+    series = [
+        (
+            pd.read_csv(directory / f"{i}_demand.csv").SUM_DEMAND,
+            pd.read_csv(directory / f"{i}_PV_generation.csv").SUM_GENERATION,
+        )
+        for i in ids
+    ]
+    total = sum(d.sum() - g.sum() for d, g in series)
+    return time.perf_counter() - start, pss(), total
+
+
+def load_store(args):
+    path, ids = args
+    start = time.perf_counter()
+    store = TimeSeriesStore(path)
+    series = [store.load(i) for i in ids]
+    total = sum(s["demand"].sum() - s["generation"].sum() for s in series)
+    return time.perf_counter() - start, pss(), total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--buildings", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND.values
+    pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION.values
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "csv").makedirs_p()
+        ids = [f"b{i:05d}" for i in range(args.buildings)]
+        for i in ids:
+            noise = rng.lognormal(0, 0.1, size=(2, len(demand)))
+            pd.DataFrame({"SUM_DEMAND": demand * noise[0]}).to_csv(
+                tmp / "csv" / f"{i}_demand.csv", index=False
+            )
+            pd.DataFrame({"SUM_GENERATION": pv * noise[1]}).to_csv(
+                tmp / "csv" / f"{i}_PV_generation.csv", index=False
+            )
+
+        start = time.perf_counter()
+        ingest(tmp / "csv", tmp / "store")
+        print(
+            f"ingest of {args.buildings} buildings: {time.perf_counter() - start:.1f} s"
+        )
+
+        for name, func, source in (
+            ("csv", load_csv, tmp / "csv"),
+            ("store", load_store, tmp / "store"),
+        ):
+            with Pool(args.workers) as pool:
+                results = pool.map(func, [(source, ids)] * args.workers)
+            seconds, memory, totals = zip(*results)
+            assert np.allclose(totals, totals[0])
+            print(
+                f"{name:>5}: {args.workers} workers loading {args.buildings} "
+                f"buildings, {np.mean(seconds):.2f} s and "
+                f"{np.mean(memory):.0f} MB PSS per worker"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Time the surrogate estimates of many candidate sites and battery sizes.
+
+The sites scale the bundled demand and PV series by random factors, and each
+site is screened with a range of battery sizes. The surrogate saved by
+`batteryopt retrain` is used if there is one; otherwise a surrogate is fitted
+on made-up savings, which is enough to time it.
+
+Example:
+    python benchmarks/bench_surrogate.py --sites 1000 --sizes 20
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from batteryopt.surrogate import SURROGATE_PATH, SavingsSurrogate, surrogate_features
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sites", type=int, default=1000)
+    parser.add_argument("--sizes", type=int, default=20)
+    args = parser.parse_args()
+
+    demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND.values
+    pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION.values
+    rng = np.random.default_rng(0)
+    sizes = np.linspace(30000, 300000, args.sizes)
+
+    if SURROGATE_PATH.exists():
+        surrogate = SavingsSurrogate.load()
+    else:
+        features = surrogate_features(demand, pv, E_batt_max=sizes)
+        surrogate = SavingsSurrogate().fit(features, 0.8 * features.shift_value)
+
+    start = time.perf_counter()
+    features = pd.concat(
+        [
+            surrogate_features(
+                demand * rng.uniform(0.5, 2), pv * rng.uniform(0, 3), E_batt_max=sizes
+            )
+            for _ in range(args.sites)
+        ],
+        ignore_index=True,
+    )
+    extracted = time.perf_counter()
+    estimates = surrogate.predict(features)
+    predicted = time.perf_counter()
+
+    n = len(estimates)
+    print(
+        f"{n} candidates: features {(extracted - start) / n * 1e6:.1f} us, "
+        f"prediction {(predicted - extracted) / n * 1e6:.2f} us per candidate"
+    )
+
+
+if __name__ == "__main__":
+    main()
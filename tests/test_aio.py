@@ -0,0 +1,145 @@
+import asyncio
+import multiprocessing
+import os
+
+import pandas as pd
+import pytest
+from pyomo.environ import value
+
+from batteryopt import aio, create_model
+from batteryopt.aio import (
+    Progress,
+    SolveJob,
+    SolveScheduler,
+    parse_progress,
+    solve_async,
+)
+
+
+class TestParseProgress:
+    @pytest.mark.parametrize(
+        "line, expected",
+        [
+            (
+                "H    0     0                    5181.8859 4000.00000  22.8%     -    0s",
+                (5181.8859, 4000, 0.228),
+            ),
+            (
+                "     0     0 4000.0000    0   20 5181.88590 4000.00000  22.8%     -    0s",
+                (5181.8859, 4000, 0.228),
+            ),
+            (
+                " R       0       0         0   0.00%   34206.366745    34223.809157"
+                "       0.05%        0      0      0       175     0.1s",
+                (34223.809157, 34206.366745, 0.0005),
+            ),
+            (
+                " J       0       0         0   0.00%   -inf            34403.505791"
+                "       Large        0      0      0         0     0.1s",
+                (34403.505791, -float("inf"), None),
+            ),
+            (
+                "Cbc0010I After 100 nodes, 20 on tree, 5000 best solution, "
+                "best possible 4000 (0.50 seconds)",
+                (5000, 4000, 0.2),
+            ),
+            (
+                "Cbc0010I After 0 nodes, 1 on tree, 1e+50 best solution, "
+                "best possible 4000 (0.12 seconds)",
+                (None, 4000, None),
+            ),
+            (
+                "+   150: mip =   5.181885906e+03 >=   4.000000000e+03  22.8% (18; 0)",
+                (5181.885906, 4000, 0.228),
+            ),
+        ],
+    )
+    def test_solvers(self, line, expected):
+        assert parse_progress(line) == pytest.approx(expected)
+
+    def test_other_lines(self):
+        assert parse_progress("Presolve removed 120 rows and 40 columns") is None
+
+
+class TestEventLoop:
+    """Tests with stub solves that the scheduler and the jobs can be created
+    outside of the event loop they run in"""
+
+    def test_scheduler(self, monkeypatch):
+        running, peak = [], []
+
+        async def solve_async(model, **kwargs):
+            running.append(model)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(model)
+            return model
+
+        monkeypatch.setattr(aio, "solve_async", solve_async)
+        scheduler = SolveScheduler(max_concurrent=2)
+
+        assert asyncio.run(scheduler.solve_all([1, 2, 3, 4])) == [1, 2, 3, 4]
+        assert max(peak) == 2
+        # again, in another event loop
+        assert asyncio.run(scheduler.solve_all([5, 6, 7])) == [5, 6, 7]
+
+    def test_progress(self, monkeypatch):
+        job = SolveJob("model", solver="gurobi")
+
+        async def _solve(loop):
+            for gap in (0.5, 0.1):
+                job._queue().put_nowait(Progress(0, 1, 1 - gap, gap))
+                await asyncio.sleep(0)
+            return job.model
+
+        monkeypatch.setattr(job, "_solve", _solve)
+
+        async def solve():
+            task = asyncio.ensure_future(job.run())
+            progress = [p.gap async for p in job.progress()]
+            return await task, progress
+
+        assert asyncio.run(solve()) == ("model", [0.5, 0.1])
+
+
+@pytest.mark.skipif(
+    os.environ.get("CI", "False").lower() == "true",
+    reason="Skipping this test on CI environment.",
+)
+class TestSolveAsync:
+    @pytest.fixture()
+    def inputs(self):
+        yield dict(
+            demand=pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND,
+            generation=pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION,
+        )
+
+    def test_progress(self, inputs):
+        week = {k: v[:168] for k, v in inputs.items()}
+
+        async def solve():
+            job = SolveJob(week, solver="gurobi")
+            task = asyncio.create_task(job.run())
+            progress = [p async for p in job.progress()]
+            return await task, progress
+
+        model, progress = asyncio.run(solve())
+        assert value(model.obj) == pytest.approx(progress[-1].incumbent, rel=1e-4)
+
+    def test_timeout(self, inputs):
+        """Tests that the solver is killed when the timeout expires"""
+        # built beforehand, so that the timeout expires during the solve
+        model = create_model(**inputs)
+        with pytest.raises(asyncio.TimeoutError):
+            asyncio.run(solve_async(model, solver="gurobi", timeout=3))
+
+        assert multiprocessing.active_children() == []
+
+    def test_scheduler(self, inputs):
+        weeks = [{k: v[i : i + 168] for k, v in inputs.items()} for i in (0, 168, 336)]
+        models = asyncio.run(
+            SolveScheduler(max_concurrent=2).solve_all(weeks, solver="gurobi")
+        )
+
+        assert len(models) == 3
+        assert all(m.E_s[0].value is not None for m in models)
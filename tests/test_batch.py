@@ -0,0 +1,152 @@
+import os
+import time
+from multiprocessing import Pool
+
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+from pyomo.environ import Var, value
+
+import batteryopt as batteryopt_package
+from batteryopt import JobLedger, ingest, run_worker, submit_batch
+from batteryopt.cli import batteryopt
+
+
+def _claim_all(args):
+    """Claim jobs until none is left and return their ids"""
+    path, worker = args
+    claimed = []
+    with JobLedger(path) as jobs:
+        while True:
+            job = jobs.claim(worker)
+            if job is None:
+                return claimed
+            claimed.append(job[0])
+            jobs.complete(job[0], worker=worker)
+
+
+class TestJobLedger:
+    @pytest.fixture()
+    def ledger(self, tmp_path):
+        with JobLedger(tmp_path / "run.db") as jobs:
+            jobs.add_jobs(["b1", "b2", "b3"], [{"E_batt_max": 50000}, {}])
+            yield jobs
+
+    def test_add_jobs(self, ledger):
+        assert ledger.status()["total"] == 6
+        # registering again only adds the new jobs
+        assert ledger.add_jobs(["b1", "b4"], [{}]) == 1
+
+    def test_claim(self, ledger):
+        job_id, building, params = ledger.claim("w1")
+
+        assert (building, params) == ("b1", {"E_batt_max": 50000})
+        assert ledger.claim("w2")[0] != job_id
+        assert ledger.status()["running"] == 2
+
+    def test_concurrent_claims(self, ledger):
+        """Tests that each job is claimed by exactly one worker process"""
+        ledger.add_jobs([f"b{i}" for i in range(4, 100)])
+        with Pool(4) as pool:
+            claimed = pool.map(_claim_all, [(ledger.path, f"w{i}") for i in range(4)])
+
+        ids = [i for worker in claimed for i in worker]
+        assert sorted(ids) == list(range(1, 103))
+        assert ledger.status()["done"] == 102
+
+    def test_lease(self, ledger):
+        """Tests that a job abandoned by a crashed worker is claimed again"""
+        ledger.claim("crashed")
+        with JobLedger(ledger.path, lease=0.01) as jobs:
+            time.sleep(0.02)
+            job_id, _, _ = jobs.claim("w2")
+            assert job_id == 1
+            assert jobs.db.execute(
+                "SELECT attempts FROM jobs WHERE id = 1"
+            ).fetchone() == (2,)
+        # the crashed worker comes back after the job was claimed again
+        assert not ledger.complete(1, objective=2.0, worker="crashed")
+        assert not ledger.fail(1, "error", worker="crashed")
+        assert ledger.complete(1, objective=1.0, worker="w2")
+        assert not ledger.complete(1, objective=3.0, worker="w2")
+        assert ledger.db.execute(
+            "SELECT status, objective FROM jobs WHERE id = 1"
+        ).fetchone() == ("done", 1.0)
+
+    def test_status(self, ledger):
+        for _ in range(3):
+            job_id, _, _ = ledger.claim()
+            ledger.complete(job_id, objective=1.0)
+        job_id, _, _ = ledger.claim()
+        ledger.fail(job_id, "error")
+        status = ledger.status()
+
+        assert status["done"] == 3
+        assert status["failed"] == 1
+        assert status["throughput"] > 0
+        # 2 jobs left
+        assert status["eta"] == pytest.approx(2 / status["throughput"] * 3600)
+        assert ledger.retry_failed() == 1
+
+    def test_cli(self, tmp_path):
+        runner = CliRunner()
+        runner.invoke(batteryopt, ["ingest", "data", str(tmp_path / "store")])
+        result = runner.invoke(
+            batteryopt, ["submit", str(tmp_path / "run.db"), str(tmp_path / "store")]
+        )
+        assert result.exit_code == 0
+        result = runner.invoke(batteryopt, ["status", str(tmp_path / "run.db")])
+        assert result.exit_code == 0
+        assert "0/1 done" in result.output
+
+    def test_run_worker_stub(self, tmp_path, monkeypatch):
+        """Tests the results and the ledger of a worker, with a stub solver"""
+
+        def run_model(model, solver=None):
+            if value(model.P_dmd[0]) > 1e9:
+                raise RuntimeError("infeasible")
+            for var in model.component_data_objects(Var):
+                var.set_value(0, skip_validation=True)
+            return model
+
+        monkeypatch.setattr(batteryopt_package, "run_model", run_model)
+        demand = pd.read_csv("data/demand_aggregated.csv")[:48]
+        pv = pd.read_csv("data/PV_generation_aggregated.csv")[:48]
+        (tmp_path / "csv").mkdir()
+        demand.to_csv(tmp_path / "csv" / "b1_demand.csv", index=False)
+        (demand * 1e6).to_csv(tmp_path / "csv" / "b2_demand.csv", index=False)
+        for i in ("b1", "b2"):
+            pv.to_csv(tmp_path / "csv" / f"{i}_PV_generation.csv", index=False)
+        ingest(tmp_path / "csv", tmp_path / "store")
+        submit_batch(tmp_path / "run.db", tmp_path / "store")
+
+        assert run_worker(tmp_path / "run.db", tmp_path / "out") == 2
+        with JobLedger(tmp_path / "run.db") as jobs:
+            status = jobs.status()
+            ((building, _, objective),) = jobs.results()
+        assert (status["done"], status["failed"]) == (1, 1)
+        assert (building, objective) == ("b1", 0)
+        results = pd.read_csv(tmp_path / "out" / "b1_1.csv", index_col="t")
+        assert len(results) == 48
+        assert {"P_dmd", "E_s", "P_charge", "P_discharge"} <= set(results.columns)
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_run_worker(self, tmp_path):
+        """Tests that a restarted worker does not solve finished jobs again"""
+        demand = pd.read_csv("data/demand_aggregated.csv")[:168]
+        pv = pd.read_csv("data/PV_generation_aggregated.csv")[:168]
+        (tmp_path / "csv").mkdir()
+        for i in ("b1", "b2"):
+            demand.to_csv(tmp_path / "csv" / f"{i}_demand.csv", index=False)
+            pv.to_csv(tmp_path / "csv" / f"{i}_PV_generation.csv", index=False)
+        ingest(tmp_path / "csv", tmp_path / "store")
+        submit_batch(tmp_path / "run.db", tmp_path / "store")
+
+        assert run_worker(tmp_path / "run.db", tmp_path / "out", max_jobs=1) == 1
+        assert run_worker(tmp_path / "run.db", tmp_path / "out") == 1
+        with JobLedger(tmp_path / "run.db") as jobs:
+            assert jobs.status()["done"] == 2
+        assert len(list((tmp_path / "out").glob("*.csv"))) == 2
@@ -1,8 +1,11 @@
 import os
+from types import SimpleNamespace
 
+import pandas as pd
 import pytest
 from click.testing import CliRunner
 
+from batteryopt import cli
 from batteryopt.cli import batteryopt
 
 
@@ -22,3 +25,30 @@ class TestCli:
             ],
         )
         assert result.exit_code == 0
+
+    def test_solver_without_logfile(self, tmp_path, monkeypatch):
+        """Tests that a solver not configured by setup_solver can be used"""
+
+        def run_model(model, solver=None):
+            assert solver == "appsi_highs"
+            model.optim = SimpleNamespace(options={})
+            return model
+
+        monkeypatch.setattr(cli, "run_model", run_model)
+        demand = pd.read_csv("data/demand_aggregated.csv")[:48]
+        pvgen = pd.read_csv("data/PV_generation_aggregated.csv")[:48]
+        demand.to_csv(tmp_path / "demand.csv", index=False)
+        pvgen.to_csv(tmp_path / "pv.csv", index=False)
+        result = CliRunner().invoke(
+            batteryopt,
+            [
+                str(tmp_path / "demand.csv"),
+                str(tmp_path / "pv.csv"),
+                str(tmp_path / "out.xlsx"),
+                "--solver",
+                "appsi_highs",
+            ],
+        )
+
+        assert result.exit_code == 0, result.output
+        assert (tmp_path / "out.xlsx").exists()
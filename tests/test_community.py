@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batteryopt import create_community_model, read_community_results, run_model
+
+
+class TestCommunity:
+    @pytest.fixture()
+    def inputs(self):
+        """Creates three buildings from the bundled data (first week)"""
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[:168]
+        pvgen = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION[:168]
+        demand = pd.DataFrame({"a": demand, "b": demand * 0.5, "c": demand.shift(6)})
+        pvgen = pd.DataFrame({"a": pvgen * 2, "b": pvgen * 0, "c": pvgen})
+        yield demand.fillna(0), pvgen
+
+    def test_create_community_model(self, inputs):
+        """Tests that building variables only exist where they are needed"""
+        demand, pvgen = inputs
+        model = create_community_model(demand, pvgen)
+
+        net = demand - pvgen
+        assert len(model.P_grid) == (net > 0).values.sum()
+        assert len(model.P_pv_export) == (net < 0).values.sum()
+        assert len(model.c_pool) == 168
+        assert list(model.k) == ["battery"]
+
+    def test_create_community_model_batteries(self, inputs):
+        """Tests multiple batteries with partial parameters"""
+        demand, pvgen = inputs
+        batteries = pd.DataFrame({"E_batt_max": [50000, 80000]}, index=["k1", "k2"])
+        model = create_community_model(demand, pvgen, batteries=batteries)
+
+        assert len(model.E_s) == 2 * 168
+        assert model.E_s["k2", 0].ub == 80000
+        assert model.E_s["k2", 0].lb == 20000
+
+    def test_shape_mismatch(self, inputs):
+        demand, pvgen = inputs
+        with pytest.raises(ValueError):
+            create_community_model(demand, pvgen.iloc[:, :2])
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_read_community_results(self, inputs):
+        """Tests reading the long-format results of a solved community"""
+        demand, pvgen = inputs
+        model = create_community_model(demand, pvgen)
+        model = run_model(model, solver="gurobi")
+        df = read_community_results(model)
+
+        assert set(df.kind) == {"building", "battery"}
+        pivot = df.pivot_table("value", "t", "variable", aggfunc="sum", fill_value=0)
+        # what the buildings send to the pool is received or stored
+        np.testing.assert_allclose(
+            pivot.P_share_out + pivot.P_discharge,
+            pivot.P_share_in + pivot.P_charge,
+            atol=1e-3,
+        )
@@ -2,6 +2,7 @@ import os
 
 import pandas as pd
 import pytest
+from pyomo.environ import value
 
 from batteryopt import create_model, read_model_results, run_model
 
@@ -17,6 +18,20 @@ class TestCore:
         model = create_model(demand, pvgen)
         yield model
 
+    def test_create_model_E_start(self, model):
+        """Tests that the initial state of charge is a mutable parameter"""
+        assert value(model.E_start) == 20000
+        model.E_start = 50000
+        assert value(model.c6.upper) == 50000
+
+    def test_read_model_results_unsolved(self, model):
+        """Tests that the columns are read without solving the model"""
+        df = read_model_results(model)
+
+        assert len(df) == len(model.t)
+        assert {"t", "tf", "P_dmd", "E_s", "P_charge", "P_grid"} <= set(df.columns)
+        assert (df.P_dmd.values == [value(model.P_dmd[t]) for t in model.t]).all()
+
     @pytest.mark.skipif(
         os.environ.get("CI", "False").lower() == "true",
         reason="Skipping this test on CI environment.",
@@ -0,0 +1,54 @@
+import os
+
+import pandas as pd
+import pytest
+from pyomo.environ import value
+
+from batteryopt import Dispatcher, create_window_model
+
+
+class TestDispatch:
+    @pytest.fixture()
+    def inputs(self):
+        """Demand and PV of a summer week"""
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND.values
+        pvgen = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION.values
+        yield demand[4000:4168], pvgen[4000:4168] * 2
+
+    def test_create_window_model(self):
+        model = create_window_model(96, E_batt_min=10000)
+
+        assert len(model.E_s) == 96
+        assert value(model.E_init) == 10000
+        assert model.P_elec.mutable
+
+    def test_update_invalid_length(self, inputs):
+        demand, pvgen = inputs
+        dispatcher = Dispatcher(horizon=96)
+        with pytest.raises(ValueError):
+            dispatcher.update(demand[:48], pvgen[:48])
+
+    def test_update_invalid_shift(self, inputs):
+        demand, pvgen = inputs
+        dispatcher = Dispatcher(horizon=96)
+        with pytest.raises(ValueError):
+            dispatcher.update(demand[:96], pvgen[:96], shift=0)
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_update(self, inputs):
+        """Tests that an incremental update gives the same result as a new model"""
+        demand, pvgen = inputs
+        dispatcher = Dispatcher(horizon=96, solver="gurobi")
+        dispatcher.update(demand[:96], pvgen[:96])
+        schedule = dispatcher.update(demand[10:106], pvgen[10:106], soc=50000, shift=10)
+
+        fresh = Dispatcher(horizon=96, solver="gurobi")
+        expected = fresh.update(demand[10:106], pvgen[10:106], soc=50000)
+
+        assert len(dispatcher.timings) == 2
+        assert value(dispatcher.model.obj) == pytest.approx(value(fresh.model.obj))
+        assert schedule.shape == expected.shape == (96, 5)
+        assert (schedule.P_grid >= -1e-6).all()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from batteryopt.kpi import (
+    baseline_cost,
+    compute_kpis,
+    dod_histogram,
+    equivalent_full_cycles,
+    rainflow,
+    self_consumption,
+    self_sufficiency,
+)
+
+
+def _aggregate(ranges, counts):
+    """Return {range: count} from the output of rainflow"""
+    result = {}
+    for r, c in zip(ranges, counts):
+        result[r] = result.get(r, 0) + c
+    return result
+
+
+class TestRainflow:
+    def test_astm_example(self):
+        """Tests the example of ASTM E1049-85 (2017), section 5.4.4"""
+        _, ranges, counts = rainflow([-2, 1, -3, 5, -1, 3, -4, 4, -2])
+
+        assert _aggregate(ranges, counts) == {3: 0.5, 4: 1.5, 6: 0.5, 8: 1, 9: 0.5}
+
+    def test_rows(self):
+        """Tests that each row is counted independently"""
+        x = np.array(
+            [
+                [-2, 1, -3, 5, -1, 3, -4, 4, -2],
+                [0, 0, 0, 0, 0, 0, 0, 0, 0],
+                [0, 2, 2, 2, 1, 1, 3, 3, 0],
+            ]
+        )
+        rows, ranges, counts = rainflow(x)
+
+        assert set(rows) == {0, 2}
+        # plateaus are not reversals
+        assert _aggregate(ranges[rows == 2], counts[rows == 2]) == {1: 1, 3: 1}
+
+    def test_random_walk(self):
+        """Tests that all the residual ranges are half cycles"""
+        x = np.cumsum(np.random.default_rng(0).normal(size=(10, 1000)), axis=1)
+        rows, ranges, counts = rainflow(x)
+
+        assert set(counts) == {0.5, 1}
+        assert (ranges > 0).all()
+        # the largest range of a row is never a full cycle
+        for i in range(10):
+            assert counts[rows == i][np.argmax(ranges[rows == i])] == 0.5
+
+
+class TestKpi:
+    @pytest.fixture()
+    def schedule(self):
+        """One day of a building charging at noon and discharging at night"""
+        demand = np.full(24, 1000.0)
+        generation = np.zeros(24)
+        generation[10:14] = 3000
+        charge = np.where(generation > 0, 1500.0, 0)
+        discharge = np.zeros(24)
+        discharge[18:24] = 1000
+        E_s = 20000 + np.cumsum(charge - discharge)
+        net = demand - generation
+        yield dict(
+            demand=demand,
+            generation=generation,
+            E_s=E_s,
+            P_charge=charge,
+            P_discharge=discharge,
+            P_grid=np.maximum(net, 0) - discharge,
+            P_pv_export=np.maximum(-net, 0) - charge,
+        )
+
+    def test_indicators(self, schedule):
+        assert self_consumption(
+            schedule["generation"], schedule["P_pv_export"]
+        ) == pytest.approx(10000 / 12000)
+        assert self_sufficiency(schedule["demand"], schedule["P_grid"]) == (
+            pytest.approx(10000 / 24000)
+        )
+        assert equivalent_full_cycles(
+            schedule["P_charge"], schedule["P_discharge"], 6000
+        ) == pytest.approx(1)
+
+    def test_compute_kpis(self, schedule):
+        """Tests that 2-D inputs give one row per building"""
+        arrays = {k: np.stack([v, v]) for k, v in schedule.items()}
+        kpis = compute_kpis(**arrays, price=0.0003, feed_in_t=0.0001, capacity=6000)
+
+        assert kpis.shape[0] == 2
+        assert kpis.cost[0] == pytest.approx(14000 * 0.0003 - 2000 * 0.0001)
+        assert kpis.baseline_cost[0] == pytest.approx(
+            baseline_cost(schedule["demand"], schedule["generation"], 0.0003, 0.0001)
+        )
+        assert kpis.savings[0] == pytest.approx(6000 * 0.0003 - 6000 * 0.0001)
+        assert kpis.peak_import[0] == 1000
+        assert kpis.rainflow_cycles[0] == 1
+
+    def test_dod_histogram(self, schedule):
+        E_s = np.stack([schedule["E_s"], schedule["E_s"]])
+        histogram, edges = dod_histogram(E_s, np.array([6000, 12000]), bins=4)
+
+        assert histogram.shape == (2, 4)
+        assert len(edges) == 5
+        # one charge and one discharge of 6000 Wh
+        np.testing.assert_allclose(histogram, [[0, 0, 0, 1], [0, 0, 1, 0]])
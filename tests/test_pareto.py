@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+from pyomo.environ import value
+
+from batteryopt import create_model, pareto_front
+from batteryopt.cli import batteryopt
+from batteryopt.pareto import _add_epsilon
+
+
+@pytest.fixture()
+def model():
+    demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[:168]
+    pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION[:168]
+    hour = np.arange(168) % 24
+    price = pd.Series(np.where((hour > 16) & (hour < 21), 0.0004, 0.0002))
+    yield create_model(demand, pv, price_of_el=price, eff=0.9, eff_dis=0.9)
+
+
+@pytest.fixture()
+def emissions():
+    yield 0.3 + 0.2 * np.cos(np.arange(168) / 24 * 2 * np.pi)
+
+
+class TestPareto:
+    def test_add_epsilon(self, model, emissions):
+        _add_epsilon(model, None)
+        _add_epsilon(model, emissions)
+
+        assert value(model.EF[0]) == pytest.approx(0.5)
+        assert not model.c_eps.active
+        assert not model.obj_impact.active
+        assert model.obj.active
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_pareto_front(self, model, emissions):
+        front = pareto_front(model, emissions, points=5, solver="gurobi")
+
+        assert len(front) == 5
+        # the cost increases when the emissions decrease
+        assert front.cost.is_monotonic_increasing
+        assert front.emissions.is_monotonic_decreasing
+        assert (front.emissions[1:] <= front.epsilon[1:] * (1 + 1e-6)).all()
+        # the model minimizes the cost alone again
+        assert not model.c_eps.active
+        assert not model.c_cost.active
+        assert model.obj.active
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_processes(self, model, emissions):
+        """Tests that worker processes find the same front"""
+        front = pareto_front(model, emissions, points=5, solver="gurobi")
+        parallel = pareto_front(
+            model, emissions, points=5, solver="gurobi", processes=2
+        )
+
+        assert parallel.cost.values == pytest.approx(front.cost.values, rel=1e-4)
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_cli(self, tmp_path):
+        result = CliRunner().invoke(
+            batteryopt,
+            [
+                "pareto",
+                "data/demand_aggregated.csv",
+                "data/PV_generation_aggregated.csv",
+                str(tmp_path / "front.csv"),
+                "--points",
+                "3",
+            ],
+        )
+        assert result.exit_code == 0
+        assert len(pd.read_csv(tmp_path / "front.csv")) == 3
@@ -0,0 +1,88 @@
+import os
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from path import Path
+
+from batteryopt import create_model, run_model
+from batteryopt import race
+from pyomo.environ import Var
+
+
+@pytest.fixture()
+def stats(tmp_path, monkeypatch):
+    """Race statistics in a temporary file"""
+    monkeypatch.setattr(race, "RACE_STATS", Path(tmp_path) / "race_stats.json")
+    yield race.RACE_STATS
+
+
+class TestRace:
+    def test_default_solver(self, stats):
+        cbc = {"solver": "cbc", "options": {"threads": 4}}
+        assert race.default_solver() == {"solver": "gurobi", "options": {}}
+        for seconds in (10, 20, 30):
+            outcomes = [
+                {"config": "glpk", "won": False, "seconds": None},
+                {"config": "cbc[threads=4]", "won": True, "seconds": seconds},
+            ]
+            race._record([race._config("glpk"), cbc], outcomes)
+
+        assert race.default_solver() == cbc
+        assert race.default_solver(min_races=4) == {"solver": "gurobi", "options": {}}
+
+    def test_label(self):
+        assert race._label(race._config("glpk")) == "glpk"
+        config = race._config({"solver": "gurobi", "options": {"Threads": 1}})
+        assert race._label(config) == "gurobi[Threads=1]"
+
+    def test_crashed(self, stats, monkeypatch):
+        """Tests that a configuration whose process dies is reported as crashed"""
+
+        class FakeSolver:
+            def __init__(self, name):
+                self.name = name
+
+            def solve(self, model):
+                if self.name == "crash":
+                    os._exit(1)
+                for var in model.component_data_objects(Var):
+                    var.set_value(0, skip_validation=True)
+                return SimpleNamespace(
+                    solver=SimpleNamespace(termination_condition="optimal"),
+                    problem=[],
+                )
+
+        monkeypatch.setattr(race, "_solver", lambda c, *args: FakeSolver(c["solver"]))
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[:24]
+        pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION[:24]
+        m = create_model(demand, pv)
+        with pytest.raises(RuntimeError):
+            race.race_model(m, ["crash"])
+        assert m.race[0]["status"] == "crashed"
+
+        m = race.race_model(create_model(demand, pv), ["crash", "ok"])
+        assert m.race[1]["won"]
+        assert m.race[0]["status"] in ("crashed", "cancelled")
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_race(self, stats):
+        """Tests that a failing configuration does not stop the race"""
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[:168]
+        pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION[:168]
+        m = run_model(
+            create_model(demand, pv),
+            race=[
+                "not_a_solver",
+                "gurobi",
+                {"solver": "gurobi", "options": {"Threads": 1}},
+            ],
+        )
+
+        assert sum(outcome["won"] for outcome in m.race) == 1
+        assert not m.race[0]["won"]
+        assert m.E_s[0].value is not None
+        assert stats.exists()
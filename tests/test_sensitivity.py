@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pyomo.environ import Constraint, Reals, Var
+
+from batteryopt import (
+    create_model,
+    hourly_marginal_values,
+    marginal_values,
+    run_model,
+    run_sensitivity,
+    sensitivity,
+)
+
+
+class TestSensitivity:
+    @pytest.fixture()
+    def model(self):
+        """Creates and solves a model of one summer week"""
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[4000:4168]
+        pvgen = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION
+        pvgen = pvgen[4000:4168] * 2
+
+        model = create_model(demand, pvgen, E_batt_max=60000)
+        yield run_model(model, solver="gurobi")
+
+    def test_run_sensitivity_stub(self, monkeypatch):
+        """Tests the LP and the marginal values with a stub solver whose duals
+        are all 1"""
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[:24]
+        pvgen = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION
+        model = create_model(demand, pvgen[:24])
+        for var in model.component_data_objects(Var):
+            var.set_value(0, skip_validation=True)
+        model.Charging[3].set_value(1)
+        domains = []
+
+        def run_model(model, solver=None):
+            domains.append(model.Charging[3].domain)
+            for con in model.component_data_objects(Constraint):
+                model.dual[con] = 1
+            return model
+
+        monkeypatch.setattr(sensitivity, "run_model", run_model)
+        model = run_sensitivity(model)
+
+        # relaxed for the solve only
+        assert domains == [Reals]
+        assert all(model.Charging[t].is_binary() for t in model.t)
+        assert all(model.Charging[t].fixed for t in model.t)
+        mv = marginal_values(model)
+        assert mv.E_batt_max == 24
+        assert mv.E_batt_min == 25
+        assert (mv.P_ch_max, mv.P_ch_min, mv.P_dis_max) == (1, 1, 0)
+        assert mv.price_of_el == 0
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_run_sensitivity(self, model):
+        """Tests that the LP with fixed binaries keeps the MILP objective"""
+        cost = model.obj()
+        model = run_sensitivity(model, solver="gurobi")
+
+        assert model.obj() == pytest.approx(cost)
+        assert all(model.Charging[t].fixed for t in model.t)
+        assert all(model.Charging[t].is_binary() for t in model.t)
+        assert len(model.dual) > 0
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_marginal_values(self, model):
+        model = run_sensitivity(model, solver="gurobi")
+        mv = marginal_values(model)
+
+        # more capacity can only lower the cost
+        assert mv.E_batt_max <= 0
+        assert mv.price_of_el == pytest.approx(sum(model.P_grid[t]() for t in model.t))
+
+        hourly = hourly_marginal_values(model)
+        assert hourly.shape == (168, 5)
+        # an extra W of demand costs at most the electricity price
+        assert (hourly.P_dmd <= 0.0002624 + 1e-9).all()
+        np.testing.assert_allclose(hourly.P_elec.sum(), mv.price_of_el)
@@ -0,0 +1,120 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from pyomo.environ import value
+
+from batteryopt import create_model, run_model
+from batteryopt.simulate import price_threshold_policy, simulate_scenarios
+
+
+class TestSimulate:
+    @pytest.fixture()
+    def day(self):
+        """One day with PV excess at noon and unmet demand at night"""
+        demand = np.full(24, 1000.0)
+        generation = np.zeros(24)
+        generation[10:14] = 3000
+        yield demand, generation
+
+    def test_greedy(self, day):
+        demand, generation = day
+        kpis, flows = simulate_scenarios(
+            demand,
+            generation,
+            eff=0.9,
+            eff_dis=0.8,
+            E_batt_min=0,
+            E_batt_max=5000,
+            P_ch_min=0,
+            P_dis_min=0,
+            E_init=0,
+            return_flows=True,
+        )
+
+        # 4 x 2000 W of excess, charged until the battery is full
+        np.testing.assert_allclose(
+            flows["P_charge"][0, 10:14], [2000, 2000, 1400 / 0.9, 0]
+        )
+        assert flows["E_s"].max() == pytest.approx(5000)
+        # 5000 Wh discharged with an efficiency of 0.8
+        assert flows["P_discharge"].sum() == pytest.approx(4000)
+        np.testing.assert_allclose(
+            flows["P_grid"] + flows["P_discharge"],
+            np.maximum(demand - generation, 0)[None],
+        )
+        assert kpis.shape[0] == 1
+
+    def test_limits(self, day):
+        """Tests the power limits and the minimum power"""
+        demand, generation = day
+        _, flows = simulate_scenarios(
+            demand,
+            generation,
+            P_ch_max=1500,
+            P_dis_min=1500,
+            E_init=20000,
+            return_flows=True,
+        )
+
+        assert flows["P_charge"].max() == 1500
+        # the unmet demand is below the minimum discharging power
+        assert flows["P_discharge"].max() == 0
+
+    def test_scenarios(self, day):
+        """Tests that the scenarios are independent of the chunks"""
+        demand, generation = day
+        generation = generation * np.linspace(0, 2, 7)[:, None]
+        price = np.linspace(0.0001, 0.0004, 7)[:, None]
+        kpis = simulate_scenarios(demand, generation, price_of_el=price)
+        chunked = simulate_scenarios(
+            demand, generation, price_of_el=price, chunk_size=3
+        )
+
+        assert kpis.shape[0] == 7
+        pd.testing.assert_frame_equal(kpis, chunked)
+
+    def test_price_threshold(self, day):
+        demand, generation = day
+        price = np.where(np.arange(24) >= 18, 0.0004, 0.0002)
+        _, flows = simulate_scenarios(
+            demand,
+            np.stack([generation, generation]),
+            policy=price_threshold_policy([0.0003, 0.0005]),
+            price_of_el=price,
+            return_flows=True,
+        )
+
+        assert (flows["P_discharge"][0, :18] == 0).all()
+        assert (flows["P_discharge"][0, 18:] > 0).all()
+        assert (flows["P_discharge"][1] == 0).all()
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_replay(self):
+        """Tests that replaying an optimal schedule gives the optimal cost"""
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[4000:4168]
+        pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION
+        pv = pv[4000:4168]
+        m = create_model(demand, pv, eff=0.95, eff_dis=0.9)
+        run_model(m, solver="gurobi")
+        P_charge, P_discharge, E_s = (
+            np.array([v.value for v in var.values()])
+            for var in (m.P_charge, m.P_discharge, m.E_s)
+        )
+        kpis, flows = simulate_scenarios(
+            demand.values,
+            pv.values,
+            P_charge,
+            P_discharge,
+            eff=0.95,
+            eff_dis=0.9,
+            E_init=E_s[-1],
+            return_flows=True,
+        )
+
+        np.testing.assert_allclose(flows["E_s"][0], E_s)
+        assert kpis.cost[0] == pytest.approx(value(m.obj))
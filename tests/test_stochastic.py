@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from batteryopt import (
+    create_stochastic_model,
+    read_stochastic_results,
+    reduce_scenarios,
+    run_model,
+)
+
+
+class TestReduceScenarios:
+    @pytest.fixture()
+    def scenarios(self):
+        """Three tight groups of scenarios, of sizes 5, 3 and 2"""
+        rng = np.random.default_rng(0)
+        centers = np.repeat([[0.0] * 24, [10.0] * 24, [-10.0] * 24], [5, 3, 2], 0)
+        yield centers + rng.normal(0, 0.1, centers.shape)
+
+    @pytest.mark.parametrize("method", ["forward", "kmedoids"])
+    def test_reduce_scenarios(self, scenarios, method):
+        """Tests that one scenario per group is kept with the group probability"""
+        idx, prob = reduce_scenarios(scenarios, 3, method=method)
+
+        groups = np.repeat([0, 1, 2], [5, 3, 2])[idx]
+        assert sorted(groups) == [0, 1, 2]
+        np.testing.assert_allclose(prob[np.argsort(groups)], [0.5, 0.3, 0.2])
+
+    def test_reduce_scenarios_probabilities(self, scenarios):
+        """Tests that input probabilities are carried over"""
+        weights = np.array([0] * 5 + [1] * 3 + [1] * 2)
+        idx, prob = reduce_scenarios(scenarios, 1, probabilities=weights)
+
+        assert idx[0] in range(5, 10)
+        assert prob.sum() == pytest.approx(1)
+
+    def test_reduce_scenarios_all(self, scenarios):
+        idx, prob = reduce_scenarios(scenarios, 10)
+
+        assert sorted(idx) == list(range(10))
+        np.testing.assert_allclose(prob, 0.1)
+
+    def test_reduce_scenarios_duplicates(self):
+        """Tests that k-medoids handles more medoids than distinct scenarios"""
+        x = np.repeat([[0.0] * 24, [1.0] * 24], [3, 2], 0)
+        idx, prob = reduce_scenarios(x, 3, method="kmedoids")
+
+        assert len(set(idx)) == 3
+        assert prob.sum() == pytest.approx(1)
+
+    def test_reduce_scenarios_invalid(self, scenarios):
+        with pytest.raises(ValueError):
+            reduce_scenarios(scenarios, 11)
+        with pytest.raises(ValueError):
+            reduce_scenarios(scenarios, 2, method="unknown")
+
+
+class TestStochasticModel:
+    @pytest.fixture()
+    def inputs(self):
+        """Creates three PV scenarios from the bundled data (first week)"""
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[:168]
+        pvgen = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION[:168]
+        demand = pd.DataFrame({s: demand for s in range(3)})
+        pvgen = pd.DataFrame({s: pvgen * f for s, f in enumerate([0.5, 1, 2])})
+        yield demand, pvgen
+
+    def test_create_stochastic_model(self, inputs):
+        demand, pvgen = inputs
+        model = create_stochastic_model(demand, pvgen, probabilities=[0.2, 0.3, 0.5])
+
+        assert len(model.E_s) == 3 * 168
+        assert not model.E_cap.fixed
+
+    def test_create_stochastic_model_schedule(self, inputs):
+        """Tests that a single schedule feasible in all scenarios is modelled"""
+        demand, pvgen = inputs
+        model = create_stochastic_model(demand, pvgen, first_stage="schedule")
+
+        assert len(model.E_s) == 168
+        assert model.E_cap.fixed
+        surplus = (pvgen - demand).clip(lower=0).min(axis=1)
+        assert [model.P_charge["schedule", t].ub for t in model.t] == surplus.tolist()
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_read_stochastic_results(self, inputs):
+        demand, pvgen = inputs
+        model = create_stochastic_model(demand, pvgen, battery_cost=0.0001)
+        model = run_model(model, solver="gurobi")
+        df = read_stochastic_results(model)
+
+        assert df.shape == (3 * 168, 5)
+        assert 20000 <= df.attrs["E_cap"] <= 100000
+        assert (df.E_s <= df.attrs["E_cap"] + 1e-6).all()
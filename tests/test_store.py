@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from batteryopt import TimeSeriesStore, create_model, ingest
+from batteryopt.cli import batteryopt
+
+
+class TestStore:
+    @pytest.fixture()
+    def portfolio(self, tmp_path):
+        """Two buildings, one of them with its own price, and a shared price"""
+        rng = np.random.default_rng(0)
+        for i in ("b1", "b2"):
+            pd.DataFrame({"SUM_DEMAND": rng.uniform(size=24)}).to_csv(
+                tmp_path / f"{i}_demand.csv", index=False
+            )
+            pd.DataFrame({"SUM_GENERATION": rng.uniform(size=24)}).to_csv(
+                tmp_path / f"{i}_PV_generation.csv", index=False
+            )
+        pd.DataFrame({"PRICE": np.full(24, 0.0003)}).to_csv(
+            tmp_path / "Price.csv", index=False
+        )
+        pd.DataFrame({"PRICE": np.full(24, 0.0001)}).to_csv(
+            tmp_path / "b2_price.csv", index=False
+        )
+        yield tmp_path
+
+    def test_ingest(self, portfolio):
+        store = ingest(portfolio, portfolio / "store")
+
+        assert store.ids == ["b1", "b2"]
+        series = store.load("b2")
+        np.testing.assert_array_equal(
+            series["demand"], pd.read_csv(portfolio / "b2_demand.csv").SUM_DEMAND
+        )
+        assert (series["price_of_el"] == 0.0001).all()
+        assert (store.load("b1")["price_of_el"] == 0.0003).all()
+
+    def test_load_without_copy(self, portfolio):
+        ingest(portfolio, portfolio / "store")
+        demand = TimeSeriesStore(portfolio / "store").load("b1")["demand"]
+
+        assert isinstance(demand.values.base, np.memmap)
+        assert not demand.values.flags.writeable
+
+    def test_create_model(self, portfolio):
+        store = ingest(portfolio, portfolio / "store")
+        m = create_model(**store.load("b1"))
+
+        assert len(m.t) == 24
+        assert m.P_elec[0] == 0.0003
+
+    def test_unknown_building(self, portfolio):
+        store = ingest(portfolio, portfolio / "store")
+        with pytest.raises(KeyError):
+            store.load("b3")
+
+    def test_different_lengths(self, portfolio):
+        pd.DataFrame({"SUM_DEMAND": np.ones(10)}).to_csv(
+            portfolio / "b3_demand.csv", index=False
+        )
+        with pytest.raises(ValueError):
+            ingest(portfolio, portfolio / "store")
+
+    def test_cli_ingest(self, tmp_path):
+        """Tests ingesting the bundled data"""
+        result = CliRunner().invoke(batteryopt, ["ingest", "data", str(tmp_path)])
+
+        assert result.exit_code == 0
+        store = TimeSeriesStore(tmp_path)
+        assert store.ids == ["aggregated"]
+        # the price of data/Price.csv is shared by all the buildings
+        assert "price_of_el" in store.load("aggregated")
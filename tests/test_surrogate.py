@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+from click.testing import CliRunner
+
+from batteryopt import (
+    JobLedger,
+    SavingsSurrogate,
+    ingest,
+    submit_batch,
+    surrogate_features,
+    training_data,
+)
+from batteryopt.cli import batteryopt
+
+
+@pytest.fixture()
+def inputs():
+    demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND
+    pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION
+    yield demand, pv
+
+
+@pytest.fixture()
+def samples(inputs):
+    """Features of random sites and batteries, with savings that depend on them"""
+    demand, pv = inputs
+    rng = np.random.default_rng(0)
+    frames = [
+        surrogate_features(
+            demand * rng.uniform(0.5, 2),
+            pv * rng.uniform(0, 3),
+            E_batt_max=rng.uniform(30000, 300000, 10),
+        )
+        for _ in range(40)
+    ]
+    features = pd.concat(frames, ignore_index=True)
+    savings = 0.8 * features.shift_value * rng.normal(1, 0.05, len(features))
+    yield features, savings.values
+
+
+class TestSurrogate:
+    def test_features(self, inputs):
+        demand, pv = inputs
+        features = surrogate_features(demand, pv, E_batt_max=[50000, 100000, 200000])
+        net = demand - pv
+        baseline = (net.clip(lower=0) * 0.0002624).sum() - (
+            (-net).clip(lower=0) * 0.0000791
+        ).sum()
+
+        assert len(features) == 3
+        assert features.baseline_cost.values == pytest.approx(baseline)
+        assert features.shift_energy.is_monotonic_increasing
+        # with a flat price, the peak of each day is the mean price
+        assert features.peak_shift_value.values == pytest.approx(
+            features.shift_value.values
+        )
+        with pytest.raises(TypeError):
+            surrogate_features(demand, pv, not_a_parameter=1)
+
+    def test_predict(self, samples):
+        features, savings = samples
+        surrogate = SavingsSurrogate(coverage=0.9).fit(features[:300], savings[:300])
+        predicted = surrogate.predict(features[300:])
+
+        inside = (savings[300:] >= predicted.savings_low) & (
+            savings[300:] <= predicted.savings_high
+        )
+        assert inside.mean() >= 0.8
+        residuals = savings[300:] - predicted.savings
+        assert 1 - residuals.var() / savings[300:].var() > 0.95
+        assert (
+            predicted.cost == features.baseline_cost[300:] - predicted.savings
+        ).all()
+
+    def test_save_load(self, samples, tmp_path):
+        features, savings = samples
+        surrogate = SavingsSurrogate().fit(features, savings)
+        surrogate.save(tmp_path / "surrogate.json")
+        loaded = SavingsSurrogate.load(tmp_path / "surrogate.json")
+
+        pd.testing.assert_frame_equal(
+            loaded.predict(features), surrogate.predict(features)
+        )
+
+    def test_training_data(self, tmp_path):
+        """Tests that the savings of the done jobs of a ledger are recovered"""
+        store = ingest("data", tmp_path / "store")
+        series = store.load(store.ids[0])
+        sizes = [{"E_batt_max": e} for e in np.linspace(30000, 300000, 12)]
+        submit_batch(tmp_path / "run.db", tmp_path / "store", sizes)
+        with JobLedger(tmp_path / "run.db") as jobs:
+            while True:
+                job = jobs.claim()
+                if job is None:
+                    break
+                # fake objective: the baseline cost minus 0.01 $/Wh of battery
+                features = surrogate_features(**series, **job[2])
+                objective = features.baseline_cost[0] - 0.01 * job[2]["E_batt_max"]
+                jobs.complete(job[0], objective)
+
+        features, savings = training_data([tmp_path / "run.db"])
+        assert len(features) == 12
+        assert savings == pytest.approx(
+            [0.01 * s["E_batt_max"] for s in sizes], rel=1e-6
+        )
+
+        result = CliRunner().invoke(
+            batteryopt,
+            ["retrain", str(tmp_path / "run.db"), "--out", tmp_path / "s.json"],
+        )
+        assert result.exit_code == 0
+        assert (tmp_path / "s.json").exists()
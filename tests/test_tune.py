@@ -0,0 +1,93 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from path import Path
+
+from batteryopt import create_model, ingest, run_model
+from batteryopt import tune
+
+
+@pytest.fixture()
+def profiles(tmp_path, monkeypatch):
+    """Solver profiles in a temporary file"""
+    monkeypatch.setattr(tune, "SOLVER_PROFILES", Path(tmp_path) / "profiles.json")
+    yield tune.SOLVER_PROFILES
+
+
+class TestTune:
+    def test_candidates(self):
+        space = tune.SEARCH_SPACES["gurobi"]
+        candidates = tune._candidates(space, 10, np.random.default_rng(0))
+
+        assert len(candidates) == 10
+        assert candidates[0] == {}
+        assert len({tuple(sorted(c.items())) for c in candidates}) == 10
+        assert all(c[k] in space[k] for c in candidates[1:] for k in space)
+
+    def test_solver_profile(self, profiles):
+        assert tune.solver_profile("gurobi", 8760) == {}
+        tune._save_profile("gurobi", 8760, {"options": {"MIPFocus": 1}})
+        tune._save_profile("gurobi", 168, {"options": {"Presolve": 2}})
+
+        assert tune.solver_profile("gurobi", 8760) == {"MIPFocus": 1}
+        # nearest horizon within a factor of 2
+        assert tune.solver_profile("gurobi", 8000) == {"MIPFocus": 1}
+        assert tune.solver_profile("gurobi", 200) == {"Presolve": 2}
+        assert tune.solver_profile("gurobi", 1000) == {}
+        assert tune.solver_profile("cbc", 8760) == {}
+
+    def test_timed_solve_crashed(self, monkeypatch):
+        """Tests that a solve whose process dies is not waited for"""
+
+        class CrashingSolver:
+            def solve(self, model):
+                os._exit(1)
+
+        monkeypatch.setattr(tune, "_solver", lambda *args: CrashingSolver())
+        demand = pd.read_csv("data/demand_aggregated.csv").SUM_DEMAND[:24]
+        pv = pd.read_csv("data/PV_generation_aggregated.csv").SUM_GENERATION[:24]
+        config = {"solver": "gurobi", "options": {}}
+
+        assert tune._timed_solve(create_model(demand, pv), config, None) is None
+
+    def test_defaults_failed(self, profiles, tmp_path, monkeypatch):
+        """Tests that no profile is saved when the defaults solve nothing"""
+        monkeypatch.setattr(tune, "_timed_solve", lambda *args: None)
+        ingest("data", tmp_path / "store")
+
+        with pytest.raises(RuntimeError):
+            tune.tune_solver(tmp_path / "store", "cbc", trials=3, horizon=24)
+        assert not profiles.exists()
+
+    def test_unknown_solver(self):
+        with pytest.raises(ValueError):
+            tune.tune_solver("data", solver="not_a_solver")
+
+    @pytest.mark.skipif(
+        os.environ.get("CI", "False").lower() == "true",
+        reason="Skipping this test on CI environment.",
+    )
+    def test_tune_solver(self, profiles, tmp_path):
+        """Tests that run_model uses the tuned parameters"""
+        demand = pd.read_csv("data/demand_aggregated.csv")
+        pv = pd.read_csv("data/PV_generation_aggregated.csv")
+        (tmp_path / "csv").mkdir()
+        for i in ("b1", "b2"):
+            demand.to_csv(tmp_path / "csv" / f"{i}_demand.csv", index=False)
+            pv.to_csv(tmp_path / "csv" / f"{i}_PV_generation.csv", index=False)
+        ingest(tmp_path / "csv", tmp_path / "store")
+        results = tune.tune_solver(
+            tmp_path / "store", "gurobi", sample=2, trials=3, horizon=168, min_gain=0
+        )
+
+        assert len(results) == 3
+        assert results["mean"].is_monotonic_increasing
+        options = tune.solver_profile("gurobi", 168)
+        assert options == results.options[0]
+        m = run_model(
+            create_model(demand.SUM_DEMAND[:168], pv.SUM_GENERATION[:168]),
+            solver="gurobi",
+        )
+        assert all(m.optim.options[k] == v for k, v in options.items())